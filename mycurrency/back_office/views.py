@@ -3,7 +3,8 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.shortcuts import render
-from mycurrency_api.operations import get_converted_data, get_currency_rates
+from mycurrency_api.operations import get_converted_batch, get_currency_rates
+from mycurrency_api.renderers import get_columns
 from django.conf import settings
 import json
 
@@ -38,18 +39,30 @@ class Converter(APIView):
 
         context = {"result": {}}
 
-        for target_currency in target_currencies:
-            try:
-                converted_data = get_converted_data(
-                    [source_currency], [amount], [target_currency]
-                )
-                context["result"][target_currency] = converted_data
-            except Exception as e:
-                context["result"][target_currency] = {
+        # Every target currency is converted with a single batch
+        items = [
+            {
+                "source_currency": source_currency,
+                "exchanged_currency": target_currency,
+                "amount": amount,
+            }
+            for target_currency in target_currencies
+        ]
+
+        try:
+            converted = get_converted_batch(items)["results"]
+        except Exception as e:
+            converted = [
+                {
                     "error": str(e),
                     "source_currency": source_currency,
                     "exchanged_currency": target_currency,
                 }
+                for target_currency in target_currencies
+            ]
+
+        for target_currency, converted_data in zip(target_currencies, converted):
+            context["result"][target_currency] = converted_data
 
         return render(request, "converter.html", context)
 
@@ -86,14 +99,11 @@ class Graph(APIView):
             currency_rates = get_currency_rates(
                 [source_currency], [date_from], [date_to]
             )
-            context["labels"] = list(currency_rates["rates"].keys())
+            # Chart takes a column of rates per currency, missing rates are gaps
+            context["labels"], columns = get_columns(currency_rates["rates"])
             for target_currency in target_currencies:
                 label = f"{source_currency} - {target_currency}"
-                data = []
-                rates = currency_rates["rates"]
-                for rate in rates:
-                    if target_currency in rates[rate].keys():
-                        data.append(rates[rate][target_currency])
+                data = columns.get(target_currency, [])
                 context["datasets"].append({"label": label, "data": data})
 
         except Exception as e:
@@ -172,11 +172,98 @@ PROVIDER_METHODS = os.environ.get(
     "PROVIDER_METHODS", default="rates,converter,historical"
 ).split(",")
 
+# Provider connections, pool size per provider and request timeouts in seconds
+PROVIDER_POOL_SIZE = int(os.environ.get("PROVIDER_POOL_SIZE", default=10))
+PROVIDER_CONNECT_TIMEOUT = float(
+    os.environ.get("PROVIDER_CONNECT_TIMEOUT", default=3.05)
+)
+PROVIDER_READ_TIMEOUT = float(os.environ.get("PROVIDER_READ_TIMEOUT", default=10))
+
+# Concurrent provider fetching, worker threads shared by the process, concurrent requests and requests per second per provider
+PROVIDER_MAX_WORKERS = int(os.environ.get("PROVIDER_MAX_WORKERS", default=8))
+PROVIDER_MAX_CONCURRENCY = int(os.environ.get("PROVIDER_MAX_CONCURRENCY", default=4))
+PROVIDER_RATE_LIMIT = float(os.environ.get("PROVIDER_RATE_LIMIT", default=10))
+
 # Redis cache
 
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.redis.RedisCache",
         "LOCATION": f"redis://{os.environ.get('REDIS_HOST', 'localhost')}:{os.environ.get('REDIS_PORT', '6379')}/1",
-    }
+    },
+    # In-process LRU cache in front of Redis for hot rates
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "local-rates",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("LOCAL_CACHE_MAX_ENTRIES", default=10000))
+        },
+    },
 }
+
+# Rates cache timeouts in seconds, rates of past dates never change so by default they never expire
+
+RATES_CACHE_TIMEOUT = int(os.environ.get("RATES_CACHE_TIMEOUT", default=5 * 60))
+RATES_CACHE_HISTORICAL_TIMEOUT = os.environ.get("RATES_CACHE_HISTORICAL_TIMEOUT")
+RATES_CACHE_HISTORICAL_TIMEOUT = (
+    int(RATES_CACHE_HISTORICAL_TIMEOUT) if RATES_CACHE_HISTORICAL_TIMEOUT else None
+)
+
+# Local cache timeout and how often (in seconds) workers check if local cache was invalidated
+
+LOCAL_CACHE_TIMEOUT = int(os.environ.get("LOCAL_CACHE_TIMEOUT", default=60))
+LOCAL_CACHE_VERSION_CHECK_INTERVAL = int(
+    os.environ.get("LOCAL_CACHE_VERSION_CHECK_INTERVAL", default=5)
+)
+
+# How often (in seconds) workers add their rates cache hits and misses to the counters in Redis
+
+CACHE_STATS_FLUSH_INTERVAL = int(
+    os.environ.get("CACHE_STATS_FLUSH_INTERVAL", default=10)
+)
+
+# Longest time (in seconds) a single caller may load a missing rate while identical requests wait for it
+
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("SINGLE_FLIGHT_TIMEOUT", default=15))
+
+# Rates which aren't stored are derived by triangulation through the pivot currency,
+# policy is one of "never", "historical" (past dates only, default) or "always"
+
+RATES_PIVOT_CURRENCY = os.environ.get(
+    "RATES_PIVOT_CURRENCY", default=AVAILABLE_CURRENCIES[0]
+)
+DERIVED_RATES_POLICY = os.environ.get("DERIVED_RATES_POLICY", default="historical")
+
+# Time of the day (HH:MM) when prefetch_rates scheduler fetches rates of the new day,
+# and how long (in seconds) it waits before retrying when providers fail
+
+PREFETCH_RATES_AT = os.environ.get("PREFETCH_RATES_AT", default="00:05")
+PREFETCH_RATES_RETRY_INTERVAL = int(
+    os.environ.get("PREFETCH_RATES_RETRY_INTERVAL", default=5 * 60)
+)
+
+# Number of days of stored rates which import_cache --warm-days loads into the cache,
+# and number of rates read from the database and written to the cache at once
+
+CACHE_WARM_DAYS = int(os.environ.get("CACHE_WARM_DAYS", default=30))
+CACHE_WARM_BATCH_SIZE = int(os.environ.get("CACHE_WARM_BATCH_SIZE", default=2000))
+
+# HTTP caching of rates and TWRR responses (seconds), responses of past windows never change
+
+HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", default=60))
+HTTP_CACHE_IMMUTABLE_MAX_AGE = int(
+    os.environ.get("HTTP_CACHE_IMMUTABLE_MAX_AGE", default=365 * 24 * 60 * 60)
+)
+
+# Longest time (in seconds) a rendered rates or TWRR response and the per-month rates versions are kept
+# in the response cache, responses of a window are unreachable once rates inside it are stored, so they must expire
+
+RESPONSE_CACHE_TIMEOUT = int(
+    os.environ.get("RESPONSE_CACHE_TIMEOUT", default=24 * 60 * 60)
+)
+
+# Number of days of rates resolved at once by streamed rates responses,
+# and the longest page (in days) of paginated rates responses
+
+RATES_STREAM_CHUNK_DAYS = int(os.environ.get("RATES_STREAM_CHUNK_DAYS", default=31))
+RATES_MAX_PAGE_SIZE = int(os.environ.get("RATES_MAX_PAGE_SIZE", default=366))
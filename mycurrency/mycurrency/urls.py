@@ -15,6 +15,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.staticfiles.urls import staticfiles_urlpatterns
 from django.urls import path, include
 
 urlpatterns = [
@@ -22,3 +23,6 @@ urlpatterns = [
     path("api/", include("mycurrency_api.urls")),
     path("back_office/", include("back_office.urls")),
 ]
+
+# ASGI server doesn't serve static files itself, serve them in DEBUG mode
+urlpatterns += staticfiles_urlpatterns()
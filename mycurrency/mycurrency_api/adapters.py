@@ -1,13 +1,60 @@
 from abc import ABC, abstractmethod
+import inspect
+import json
 import random
+import threading
+from datetime import datetime, timedelta
 from .models import Provider
-from .drivers import BaseDriver, MockDriver
+from .drivers import AsyncBaseDriver, BaseDriver, MockDriver
+from .caching import increment
+from .scheduler import gather_concurrently, provider_limiters, run_concurrently
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import cache
 
 # Accessing an available currencies from settings
 FIXER_ACCESS_KEY = settings.FIXER_ACCESS_KEY
 AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
 
+PROVIDERS_VERSION_KEY = "providers-version"
+
+
+class DriverPool:
+    """
+    Keeps one driver per provider configuration, so every provider reuses its pooled HTTP session.
+    """
+
+    def __init__(self, driver_class=BaseDriver):
+        self.driver_class = driver_class
+        self.drivers = {}
+        self.lock = threading.Lock()
+
+    def get(self, provider) -> BaseDriver:
+        key = (
+            provider.name,
+            provider.api_url,
+            json.dumps(provider.endpoints, sort_keys=True),
+        )
+
+        with self.lock:
+            driver = self.drivers.get(key)
+
+            if not driver:
+                # Provider configuration changed, drop drivers of its old configuration
+                for old_key in [x for x in self.drivers if x[0] == provider.name]:
+                    self.drivers.pop(old_key).close()
+
+                driver = self.driver_class(
+                    api_url=provider.api_url, **provider.endpoints
+                )
+                self.drivers[key] = driver
+
+        return driver
+
+
+driver_pool = DriverPool()
+async_driver_pool = DriverPool(AsyncBaseDriver)
+
 
 # Abstract class for provider
 class AbstractAdapter(ABC):
@@ -17,6 +64,12 @@ class AbstractAdapter(ABC):
     ):
         pass
 
+    @abstractmethod
+    def get_exchange_rate_series(
+        self, source_currency: str, start_date: str, end_date: str
+    ):
+        pass
+
     @abstractmethod
     def get_currency_symbols(self):
         pass
@@ -30,11 +83,12 @@ class AbstractAdapter(ABC):
 
 # Provider Adapter class
 class Adapter(AbstractAdapter):
+    driver_pool = driver_pool
+
     def __init__(self):
-        # Get active providers
-        self.active_providers = Provider.objects.filter(priority__gt=0).order_by(
-            "priority"
-        )
+        # Active providers are loaded on first use
+        self.active_providers = None
+        self.providers_version = None
 
     def get_exchange_rate_data(
         self,
@@ -50,22 +104,35 @@ class Adapter(AbstractAdapter):
         self.update_adapters()
 
         for provider in self.active_providers:
-            if provider.name == "Mock":
-                driver = MockDriver()
-                rates = driver.historical(date=valuation_date, base=source_currency)
-
-            elif provider.name == "Fixer":
-                driver = BaseDriver(api_url=provider.api_url, **provider.endpoints)
-                rates = driver.historical(
-                    endpoint=valuation_date,
-                    access_key=FIXER_ACCESS_KEY,
-                    base=source_currency,
-                )
+            rates = self.get_historical_data(
+                provider, source_currency, valuation_date, *args, **kwargs
+            )
+
+            if not rates:
+                continue
+            return rates
 
-            else:
-                # default Provider
-                driver = BaseDriver(api_url=provider.api_url, **provider.endpoints)
-                rates = driver.historical(*args, **kwargs)
+        raise Exception("Providers were unable to gather rate data.")
+
+    def get_exchange_rate_series(
+        self, source_currency: str, start_date: str, end_date: str, *args, **kwargs
+    ):
+        """
+        Run timeseries method for every provider sorted by priority, return data if exists.
+        Providers which don't declare timeseries endpoint are asked day by day using historical method.
+        """
+        self.update_adapters()
+
+        for provider in self.active_providers:
+            rates = self.get_timeseries_data(
+                provider, source_currency, start_date, end_date, *args, **kwargs
+            )
+
+            if not rates:
+                # Fall back to per-day calls
+                rates = self.get_historical_series(
+                    provider, source_currency, start_date, end_date, *args, **kwargs
+                )
 
             if not rates:
                 continue
@@ -73,6 +140,64 @@ class Adapter(AbstractAdapter):
 
         raise Exception("Providers were unable to gather rate data.")
 
+    def get_timeseries_data(
+        self,
+        provider,
+        source_currency: str,
+        start_date: str,
+        end_date: str,
+        *args,
+        **kwargs
+    ):
+        """
+        Run timeseries method of the provider, return False if provider doesn't declare it.
+        """
+        if provider.name != "Mock" and "timeseries" not in provider.endpoints:
+            return False
+
+        with provider_limiters.get(provider.name):
+            return self.request_timeseries(
+                provider, source_currency, start_date, end_date, *args, **kwargs
+            )
+
+    def get_historical_data(
+        self, provider, source_currency: str, valuation_date: str, *args, **kwargs
+    ):
+        """
+        Run historical method of the provider.
+        """
+        with provider_limiters.get(provider.name):
+            return self.request_historical(
+                provider, source_currency, valuation_date, *args, **kwargs
+            )
+
+    def get_historical_series(
+        self,
+        provider,
+        source_currency: str,
+        start_date: str,
+        end_date: str,
+        *args,
+        **kwargs
+    ):
+        """
+        Run historical method of the provider for every date from start_date to end_date,
+        return data in the same format as timeseries method.
+        """
+        dates = self.get_dates(start_date, end_date)
+
+        # Days are fetched concurrently, provider limiter keeps the provider within its budget
+        results = run_concurrently(
+            lambda date: self.get_historical_data(
+                provider, source_currency, date, *args, **kwargs
+            ),
+            dates,
+        )
+
+        return self.merge_historical_series(
+            source_currency, start_date, end_date, dates, results
+        )
+
     def get_currency_symbols(self, *args, **kwargs):
         """
         Run symbols method for every provider sorted by priority, return data if exists.
@@ -80,18 +205,8 @@ class Adapter(AbstractAdapter):
         self.update_adapters()
 
         for provider in self.active_providers:
-            if provider.name == "Mock":
-                driver = MockDriver()
-                symbols = driver.symbols()
-
-            elif provider.name == "Fixer":
-                driver = BaseDriver(api_url=provider.api_url, **provider.endpoints)
-                symbols = driver.symbols(access_key=FIXER_ACCESS_KEY)
-
-            else:
-                # default Provider
-                driver = BaseDriver(api_url=provider.api_url, **provider.endpoints)
-                symbols = driver.symbols(*args, **kwargs)
+            with provider_limiters.get(provider.name):
+                symbols = self.request_symbols(provider, *args, **kwargs)
 
             if not symbols:
                 continue
@@ -113,36 +228,316 @@ class Adapter(AbstractAdapter):
         self.update_adapters()
 
         for provider in self.active_providers:
-            if provider.name == "Mock":
-                driver = MockDriver()
-                converted_data = driver.converter(
-                    source_currency, exchanged_currency, amount
-                )
-
-            elif provider.name == "Fixer":
-                driver = BaseDriver(api_url=provider.api_url, **provider.endpoints)
-                converted_data = driver.converter(
-                    access_key=FIXER_ACCESS_KEY,
-                    currency_from=source_currency,
-                    to=exchanged_currency,
-                    amount=amount,
+            with provider_limiters.get(provider.name):
+                converted_data = self.request_converter(
+                    provider,
+                    source_currency,
+                    exchanged_currency,
+                    amount,
+                    *args,
+                    **kwargs,
                 )
 
-            else:
-                # default Provider
-                driver = BaseDriver(api_url=provider.api_url, **provider.endpoints)
-                converted_data = driver.converter(*args, **kwargs)
-
             if not converted_data:
                 continue
             return converted_data
 
         raise Exception("Providers were unable to convert currencies.")
 
+    def request_timeseries(
+        self,
+        provider,
+        source_currency: str,
+        start_date: str,
+        end_date: str,
+        *args,
+        **kwargs
+    ):
+        """
+        Call timeseries method of the provider's driver.
+        """
+        if provider.name == "Mock":
+            driver = MockDriver()
+            return driver.timeseries(
+                start_date=start_date, end_date=end_date, base=source_currency
+            )
+
+        driver = self.driver_pool.get(provider)
+
+        if provider.name == "Fixer":
+            return driver.timeseries(
+                access_key=FIXER_ACCESS_KEY,
+                start_date=start_date,
+                end_date=end_date,
+                base=source_currency,
+            )
+
+        # default Provider
+        return driver.timeseries(*args, **kwargs)
+
+    def request_historical(
+        self, provider, source_currency: str, valuation_date: str, *args, **kwargs
+    ):
+        """
+        Call historical method of the provider's driver.
+        """
+        if provider.name == "Mock":
+            driver = MockDriver()
+            return driver.historical(date=valuation_date, base=source_currency)
+
+        driver = self.driver_pool.get(provider)
+
+        if provider.name == "Fixer":
+            return driver.historical(
+                endpoint=valuation_date,
+                access_key=FIXER_ACCESS_KEY,
+                base=source_currency,
+            )
+
+        # default Provider
+        return driver.historical(*args, **kwargs)
+
+    def request_symbols(self, provider, *args, **kwargs):
+        """
+        Call symbols method of the provider's driver.
+        """
+        if provider.name == "Mock":
+            driver = MockDriver()
+            return driver.symbols()
+
+        driver = self.driver_pool.get(provider)
+
+        if provider.name == "Fixer":
+            return driver.symbols(access_key=FIXER_ACCESS_KEY)
+
+        # default Provider
+        return driver.symbols(*args, **kwargs)
+
+    def request_converter(
+        self,
+        provider,
+        source_currency: str,
+        exchanged_currency: str,
+        amount: float,
+        *args,
+        **kwargs
+    ):
+        """
+        Call converter method of the provider's driver.
+        """
+        if provider.name == "Mock":
+            driver = MockDriver()
+            return driver.converter(source_currency, exchanged_currency, amount)
+
+        driver = self.driver_pool.get(provider)
+
+        if provider.name == "Fixer":
+            return driver.converter(
+                access_key=FIXER_ACCESS_KEY,
+                currency_from=source_currency,
+                to=exchanged_currency,
+                amount=amount,
+            )
+
+        # default Provider
+        return driver.converter(*args, **kwargs)
+
+    @staticmethod
+    def get_dates(start_date: str, end_date: str) -> list:
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+        return [str(start + timedelta(days=i)) for i in range((end - start).days + 1)]
+
+    @staticmethod
+    def merge_historical_series(
+        source_currency: str, start_date: str, end_date: str, dates: list, results
+    ):
+        """
+        Merge historical responses into the same format as timeseries method returns.
+        """
+        if not all(results):
+            return False
+
+        return {
+            "success": True,
+            "timeseries": True,
+            "start_date": start_date,
+            "end_date": end_date,
+            "base": source_currency,
+            "rates": {date: rates["rates"] for date, rates in zip(dates, results)},
+        }
+
     def update_adapters(self):
         """
-        Update active providers list and order them by priority.
+        Update active providers list and order them by priority,
+        providers are only re-read when they changed in any worker.
         """
-        self.active_providers = Provider.objects.filter(priority__gt=0).order_by(
-            "priority"
+        version = cache.get(PROVIDERS_VERSION_KEY)
+
+        if self.active_providers is None or version != self.providers_version:
+            self.active_providers = list(
+                Provider.objects.filter(priority__gt=0).order_by("priority")
+            )
+            self.providers_version = version
+
+
+class AsyncAdapter(Adapter):
+    """
+    Provider Adapter with coroutine methods, providers are asked with async drivers,
+    so waiting for a provider doesn't block the worker.
+    """
+
+    driver_pool = async_driver_pool
+
+    async def get_exchange_rate_data(
+        self,
+        source_currency: str,
+        exchanged_currency: str,
+        valuation_date: str,
+        *args,
+        **kwargs
+    ):
+        await sync_to_async(self.update_adapters)()
+
+        for provider in self.active_providers:
+            rates = await self.get_historical_data(
+                provider, source_currency, valuation_date, *args, **kwargs
+            )
+
+            if not rates:
+                continue
+            return rates
+
+        raise Exception("Providers were unable to gather rate data.")
+
+    async def get_exchange_rate_series(
+        self, source_currency: str, start_date: str, end_date: str, *args, **kwargs
+    ):
+        await sync_to_async(self.update_adapters)()
+
+        for provider in self.active_providers:
+            rates = await self.get_timeseries_data(
+                provider, source_currency, start_date, end_date, *args, **kwargs
+            )
+
+            if not rates:
+                # Fall back to per-day calls
+                rates = await self.get_historical_series(
+                    provider, source_currency, start_date, end_date, *args, **kwargs
+                )
+
+            if not rates:
+                continue
+            return rates
+
+        raise Exception("Providers were unable to gather rate data.")
+
+    async def get_timeseries_data(
+        self,
+        provider,
+        source_currency: str,
+        start_date: str,
+        end_date: str,
+        *args,
+        **kwargs
+    ):
+        if provider.name != "Mock" and "timeseries" not in provider.endpoints:
+            return False
+
+        async with provider_limiters.aget(provider.name):
+            return await resolve(
+                self.request_timeseries(
+                    provider, source_currency, start_date, end_date, *args, **kwargs
+                )
+            )
+
+    async def get_historical_data(
+        self, provider, source_currency: str, valuation_date: str, *args, **kwargs
+    ):
+        async with provider_limiters.aget(provider.name):
+            return await resolve(
+                self.request_historical(
+                    provider, source_currency, valuation_date, *args, **kwargs
+                )
+            )
+
+    async def get_historical_series(
+        self,
+        provider,
+        source_currency: str,
+        start_date: str,
+        end_date: str,
+        *args,
+        **kwargs
+    ):
+        dates = self.get_dates(start_date, end_date)
+
+        results = await gather_concurrently(
+            lambda date: self.get_historical_data(
+                provider, source_currency, date, *args, **kwargs
+            ),
+            dates,
+        )
+
+        return self.merge_historical_series(
+            source_currency, start_date, end_date, dates, results
         )
+
+    async def get_currency_symbols(self, *args, **kwargs):
+        await sync_to_async(self.update_adapters)()
+
+        for provider in self.active_providers:
+            async with provider_limiters.aget(provider.name):
+                symbols = await resolve(self.request_symbols(provider, *args, **kwargs))
+
+            if not symbols:
+                continue
+            return symbols
+
+        raise Exception("Providers were unable to gather symbols.")
+
+    async def convert_currencies(
+        self,
+        source_currency: str,
+        exchanged_currency: str,
+        amount: float,
+        *args,
+        **kwargs
+    ):
+        await sync_to_async(self.update_adapters)()
+
+        for provider in self.active_providers:
+            async with provider_limiters.aget(provider.name):
+                converted_data = await resolve(
+                    self.request_converter(
+                        provider,
+                        source_currency,
+                        exchanged_currency,
+                        amount,
+                        *args,
+                        **kwargs,
+                    )
+                )
+
+            if not converted_data:
+                continue
+            return converted_data
+
+        raise Exception("Providers were unable to convert currencies.")
+
+
+async def resolve(result):
+    """
+    Mock driver isn't async, await result only if driver returned a coroutine.
+    """
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+def bump_providers_version(*args, **kwargs):
+    """
+    Make adapters of every worker re-read providers.
+    """
+    increment(PROVIDERS_VERSION_KEY)
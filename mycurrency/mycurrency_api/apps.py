@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_save, post_delete
 
 
 class MycurrencyApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mycurrency_api"
+
+    def ready(self):
+        from .adapters import bump_providers_version
+        from .models import Currency, Provider
+        from .registry import currency_registry
+
+        # Currency registry is loaded on first access and dropped whenever currencies change
+        post_save.connect(currency_registry.invalidate, sender=Currency)
+        post_delete.connect(currency_registry.invalidate, sender=Currency)
+
+        # Adapters re-read providers only when they change
+        post_save.connect(bump_providers_version, sender=Provider)
+        post_delete.connect(bump_providers_version, sender=Provider)
@@ -0,0 +1,339 @@
+import asyncio
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache, caches
+
+# Accessing local cache settings
+LOCAL_CACHE_TIMEOUT = settings.LOCAL_CACHE_TIMEOUT
+LOCAL_CACHE_VERSION_CHECK_INTERVAL = settings.LOCAL_CACHE_VERSION_CHECK_INTERVAL
+CACHE_STATS_FLUSH_INTERVAL = settings.CACHE_STATS_FLUSH_INTERVAL
+SINGLE_FLIGHT_TIMEOUT = settings.SINGLE_FLIGHT_TIMEOUT
+RESPONSE_CACHE_TIMEOUT = settings.RESPONSE_CACHE_TIMEOUT
+
+# How often (in seconds) waiting callers check if the value appeared in the cache
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+
+
+def increment(key: str, delta: int = 1) -> int:
+    """
+    Increment counter in Redis, counter is created if it doesn't exist yet.
+    """
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+class LocalCounters:
+    """
+    In-process counters, added to the counters in Redis at most once per interval,
+    so counting doesn't cost a round-trip to Redis.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts = {}
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, key: str, delta: int = 1):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + delta
+            flush = time.monotonic() - self.flushed_at >= self.interval
+
+        if flush:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+            self.flushed_at = time.monotonic()
+
+        for key, delta in counts.items():
+            if delta:
+                increment(key, delta)
+
+
+cache_stats = LocalCounters(CACHE_STATS_FLUSH_INTERVAL)
+
+
+class TieredCache:
+    """
+    Two-tier cache, bounded thread-safe in-process LRU cache ("local" cache alias) in front of
+    the shared Redis cache. When a value is re-stored, version key in Redis is bumped and
+    every worker clears its local cache on the next version check.
+    """
+
+    def __init__(self, version_key: str):
+        self.version_key = version_key
+        self.version = None
+        self.version_checked_at = 0
+        self.lock = threading.Lock()
+
+    @property
+    def local_cache(self):
+        return caches["local"]
+
+    def get_local_timeout(self, timeout):
+        if timeout is None:
+            return LOCAL_CACHE_TIMEOUT
+        return min(timeout, LOCAL_CACHE_TIMEOUT)
+
+    def check_version(self):
+        """
+        Clear local cache if it was invalidated by any worker, Redis is asked at most once per interval.
+        """
+        now = time.monotonic()
+
+        with self.lock:
+            if now - self.version_checked_at < LOCAL_CACHE_VERSION_CHECK_INTERVAL:
+                return
+            self.version_checked_at = now
+
+        version = cache.get(self.version_key)
+
+        with self.lock:
+            if version != self.version:
+                self.local_cache.clear()
+                self.version = version
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys) -> dict:
+        """
+        Get values from local cache, only missing ones are fetched from Redis with a single round-trip.
+        """
+        self.check_version()
+
+        keys = list(keys)
+        values = self.local_cache.get_many(keys)
+
+        missing_keys = [x for x in keys if x not in values]
+
+        if missing_keys:
+            cached_values = cache.get_many(missing_keys)
+            self.local_cache.set_many(cached_values, timeout=LOCAL_CACHE_TIMEOUT)
+            values.update(cached_values)
+
+        return values
+
+    def set(self, key, value, timeout=None):
+        self.set_many({key: value}, timeout=timeout)
+
+    def set_many(self, data: dict, timeout=None):
+        if not data:
+            return
+
+        cache.set_many(data, timeout=timeout)
+        self.local_cache.set_many(data, timeout=self.get_local_timeout(timeout))
+
+    def get_many_local(self, keys) -> dict:
+        """
+        Get values which are kept only in the local cache, values derived from the stored ones.
+        """
+        self.check_version()
+
+        return self.local_cache.get_many(list(keys))
+
+    def set_many_local(self, data: dict):
+        self.local_cache.set_many(data, timeout=LOCAL_CACHE_TIMEOUT)
+
+    def delete_many_local(self, keys):
+        """
+        Drop values from the local cache of this worker only.
+        """
+        self.local_cache.delete_many(list(keys))
+
+    def invalidate(self):
+        """
+        Invalidate local caches of every worker.
+        """
+        version = increment(self.version_key)
+
+        with self.lock:
+            self.local_cache.clear()
+            self.version = version
+            self.version_checked_at = time.monotonic()
+
+
+rates_cache = TieredCache("rates-cache-version")
+
+
+class SingleFlight:
+    """
+    Coalesces identical cache misses, only one caller loads the value (one per process using a local lock,
+    one across workers using a Redis lock), the rest wait for the loaded value to appear in the cache.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def local_lock(self, key: str):
+        with self.lock:
+            entry = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self.locks.pop(key, None)
+
+    def run(self, key: str, check, load):
+        """
+        Returns value from check() if it exists, otherwise value from load(), which is called by a single caller.
+        """
+        with self.local_lock(key):
+            value = check()
+            if value:
+                return value
+
+            lock_key = f"lock-{key}"
+            deadline = time.monotonic() + self.timeout
+
+            while not cache.add(lock_key, 1, timeout=self.timeout):
+                # Another worker is loading the value
+                time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+
+                value = check()
+                if value:
+                    return value
+
+                if time.monotonic() > deadline:
+                    # Lock holder didn't load the value in time, load it ourselves
+                    return load()
+
+            try:
+                return check() or load()
+            finally:
+                cache.delete(lock_key)
+
+    async def arun(self, key: str, check, load):
+        """
+        Async version of run, check and load are coroutine functions.
+        Waiting callers of the same process are coalesced by the Redis lock too.
+        """
+        value = await check()
+        if value:
+            return value
+
+        lock_key = f"lock-{key}"
+        deadline = time.monotonic() + self.timeout
+
+        while not await cache.aadd(lock_key, 1, timeout=self.timeout):
+            # Another caller is loading the value
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+
+            value = await check()
+            if value:
+                return value
+
+            if time.monotonic() > deadline:
+                # Lock holder didn't load the value in time, load it ourselves
+                return await load()
+
+        try:
+            return await check() or await load()
+        finally:
+            await cache.adelete(lock_key)
+
+
+single_flight = SingleFlight(SINGLE_FLIGHT_TIMEOUT)
+
+
+class ResponseCache:
+    """
+    Cache of serialized responses which depend on rates of a date window. Every currency has a version
+    per month, the time its rates of the month were last stored, so cached responses and validators
+    of windows which include a re-stored date change, while other windows are left alone.
+    Versions expire like cached responses, an expired version is set to a new time.
+    """
+
+    @staticmethod
+    def get_months(start_date, end_date) -> list:
+        months = []
+        year, month = start_date.year, start_date.month
+
+        while (year, month) <= (end_date.year, end_date.month):
+            months.append(f"{year}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+        return months
+
+    @staticmethod
+    def get_version_id(code: str, month: str) -> str:
+        return f"response-version-{code}-{month}"
+
+    def get_versions(self, codes: list, start_date, end_date) -> dict:
+        """
+        Getting versions of every currency and month of the window with a single round-trip,
+        unknown ones are set to now with another one.
+        """
+        version_ids = [
+            self.get_version_id(code, month)
+            for code in sorted(set(codes))
+            for month in self.get_months(start_date, end_date)
+        ]
+        versions = cache.get_many(version_ids)
+
+        now = time.time()
+        missing_versions = {x: now for x in version_ids if x not in versions}
+
+        if missing_versions:
+            # Expired or never stored, any new version only makes validators and keys of the window change
+            cache.set_many(missing_versions, timeout=RESPONSE_CACHE_TIMEOUT)
+            versions.update(missing_versions)
+
+        return {x: versions[x] for x in version_ids}
+
+    def get_key(self, fingerprint: str, versions: dict) -> str:
+        """
+        Cache key of the response, built from the response fingerprint and versions of the window.
+        """
+        key = "|".join([fingerprint] + [f"{x}:{versions[x]!r}" for x in versions])
+        return f"response-{hashlib.sha1(key.encode()).hexdigest()}"
+
+    def get(self, key: str):
+        return cache.get(key)
+
+    def set(self, key: str, content: bytes, timeout=None):
+        """
+        Responses always expire, keys of responses of a window change when its rates are stored,
+        so entries under old keys are never read again.
+        """
+        timeout = min(
+            RESPONSE_CACHE_TIMEOUT if timeout is None else timeout,
+            RESPONSE_CACHE_TIMEOUT,
+        )
+        cache.set(key, content, timeout=timeout)
+
+    def touch(self, codes, dates):
+        """
+        Changes versions of the months of the dates, so responses of every window which includes
+        any of the dates get new validators and cache keys.
+        """
+        now = time.time()
+        months = {str(date)[:7] for date in dates}
+
+        cache.set_many(
+            {
+                self.get_version_id(code, month): now
+                for code in codes
+                for month in months
+            },
+            timeout=RESPONSE_CACHE_TIMEOUT,
+        )
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,98 @@
+import hashlib
+from datetime import datetime
+from urllib.parse import urlencode
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .caching import response_cache
+
+# Accessing HTTP caching and derived rates settings
+AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
+DERIVED_RATES_POLICY = settings.DERIVED_RATES_POLICY
+HTTP_CACHE_MAX_AGE = settings.HTTP_CACHE_MAX_AGE
+HTTP_CACHE_IMMUTABLE_MAX_AGE = settings.HTTP_CACHE_IMMUTABLE_MAX_AGE
+
+
+def get_dependencies(codes: list) -> list:
+    """
+    Currencies which rates a response of the currencies depends on.
+    """
+    if DERIVED_RATES_POLICY != "never":
+        # Derived rates may depend on rates of any currency
+        return AVAILABLE_CURRENCIES
+    return codes
+
+
+def get_fingerprint(request, version: str, end_date) -> str:
+    """
+    Identifies the response by the API version, path, normalized query parameters, the media type
+    and the last date of the window, which isn't a part of the query of windows which end today.
+    """
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    return "|".join(
+        [
+            version,
+            request.path,
+            query,
+            request.accepted_renderer.format,
+            request.accepted_media_type,
+            str(end_date),
+        ]
+    )
+
+
+def get_versions(codes: list, start_date, end_date) -> dict:
+    """
+    Getting versions of rates of the window which a response of the currencies depends on.
+    """
+    return response_cache.get_versions(get_dependencies(codes), start_date, end_date)
+
+
+def get_validators(request, version: str, versions: dict, end_date) -> tuple:
+    """
+    Strong ETag and Last-Modified of a response of the window, ETag changes when the query
+    or rates of any month of the window change.
+    """
+    fingerprint = "|".join(
+        [get_fingerprint(request, version, end_date)]
+        + [f"{x}:{versions[x]!r}" for x in versions]
+    )
+    etag = f'"{hashlib.sha1(fingerprint.encode()).hexdigest()}"'
+
+    return etag, max(versions.values(), default=0)
+
+
+def get_response_key(request, version: str, versions: dict, end_date) -> str:
+    """
+    Response cache key, changes when the query or rates of the window change.
+    """
+    return response_cache.get_key(get_fingerprint(request, version, end_date), versions)
+
+
+def get_not_modified_response(request, etag: str, last_modified: float):
+    """
+    Returns 304 response if client already has the current version of the response, otherwise None.
+    """
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+
+
+def add_caching_headers(response, etag: str, last_modified: float, end_date):
+    """
+    Responses of past windows never change, so they are immutable, windows which include today
+    are cached for a short time.
+    """
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+
+    end_date = datetime(*[int(i) for i in str(end_date).split("-")]).date()
+
+    if end_date < datetime.now().date():
+        patch_cache_control(
+            response, public=True, max_age=HTTP_CACHE_IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        patch_cache_control(response, public=True, max_age=HTTP_CACHE_MAX_AGE)
+
+    return response
@@ -1,19 +1,39 @@
+import asyncio
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
 import random
 import time
+import weakref
 from django.conf import settings
 from datetime import datetime, timedelta
 
-# Accessing an available currencies from settings
+# Accessing an available currencies and provider connection settings from settings
 AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
+PROVIDER_POOL_SIZE = settings.PROVIDER_POOL_SIZE
+PROVIDER_CONNECT_TIMEOUT = settings.PROVIDER_CONNECT_TIMEOUT
+PROVIDER_READ_TIMEOUT = settings.PROVIDER_READ_TIMEOUT
+
+
+def create_session() -> requests.Session:
+    """
+    HTTP session with a pool of keep-alive connections, so provider requests don't pay a new handshake.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PROVIDER_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 class BaseDriver:
-    def __init__(self, api_url: str, *args, **kwargs):
+    def __init__(self, api_url: str, *args, session=None, timeout=None, **kwargs):
         """
         Initialize the Base Driver and create endpoint methods.
         """
         self.API_URL = api_url
+        self.session = session or create_session()
+        self.timeout = timeout or (PROVIDER_CONNECT_TIMEOUT, PROVIDER_READ_TIMEOUT)
         for method_name, endpoint_args in kwargs.items():
             setattr(
                 self,
@@ -21,6 +41,50 @@ class BaseDriver:
                 self._create_endpoint_method(method_name, endpoint_args),
             )
 
+    def _prepare_request(self, method_name, endpoint_args, kwargs):
+        """
+        Check endpoint method arguments, returns url and query parameters of the request.
+        """
+        # Get pre-written endpoint name, driver is reused so endpoint_args must stay untouched
+        endpoint_name, *endpoint_params = endpoint_args
+
+        if len(kwargs) == len(endpoint_args) and "endpoint" in kwargs.keys():
+            # You can also pass endpoint name as argument, in case endpoint name is parameter
+            endpoint_name = kwargs.pop("endpoint")
+
+        # Handle argument errors
+        kwargs_diff = set(kwargs.keys()) - set(endpoint_params)
+        endpoint_args_diff = set(endpoint_params) - set(kwargs.keys())
+
+        if endpoint_args_diff:
+            raise TypeError(
+                f"{method_name} missing required positional arguments: {endpoint_args_diff}"
+            )
+
+        if kwargs_diff:
+            raise TypeError(
+                f"{method_name} takes {endpoint_params} positional arguments but {kwargs_diff} were given"
+            )
+
+        url = self.API_URL + endpoint_name
+
+        if method_name == "converter":
+            # Fixer.io convert method requires argument to be named 'from',
+            # But it is not possible in python
+            if "currency_from" in kwargs.keys():
+                kwargs["from"] = kwargs["currency_from"]
+                kwargs.pop("currency_from")
+
+        return url, kwargs
+
+    @staticmethod
+    def _parse_result(result):
+        if not result["success"]:
+            # If it's not a success return False
+            return False
+
+        return result
+
     def _create_endpoint_method(self, method_name, endpoint_args):
         """
         Endpoint methods are functions which connects method to an endpoint,
@@ -28,49 +92,100 @@ class BaseDriver:
         """
 
         def method(*args, **kwargs):
-            if len(kwargs) == len(endpoint_args):
-                # You can also pass endpoint name as argument, in case endpoint name is parameter
-                endpoint_name = endpoint_args.pop(0)
-                if "endpoint" in kwargs.keys():
-                    endpoint_name = kwargs.pop("endpoint")
-            else:
-                # Get pre-written endpoint name
-                endpoint_name = endpoint_args.pop(0)
-
-            # Handle argument errors
-            kwargs_diff = set(kwargs.keys()) - set(endpoint_args)
-            endpoint_args_diff = set(endpoint_args) - set(kwargs.keys())
-
-            if endpoint_args_diff:
-                raise TypeError(
-                    f"{method_name} missing required positional arguments: {endpoint_args_diff}"
-                )
-
-            if kwargs_diff:
-                raise TypeError(
-                    f"{method_name} takes {endpoint_args} positional arguments but {kwargs_diff} were given"
-                )
+            url, params = self._prepare_request(method_name, endpoint_args, kwargs)
 
             # Make request
-            url = self.API_URL + endpoint_name
+            try:
+                result = self.session.get(
+                    url, params=params, timeout=self.timeout
+                ).json()
+            except (requests.RequestException, ValueError):
+                # Unreachable, slow or broken provider is treated as a failure
+                return False
+
+            return self._parse_result(result)
+
+        return method
+
+    def close(self):
+        self.session.close()
 
-            if method_name == "converter":
-                # Fixer.io convert method requires argument to be named 'from',
-                # But it is not possible in python
-                if "currency_from" in kwargs.keys():
-                    kwargs["from"] = kwargs["currency_from"]
-                    kwargs.pop("currency_from")
 
-            result = requests.get(url, params=kwargs).json()
+class AsyncBaseDriver(BaseDriver):
+    """
+    Base Driver with coroutine endpoint methods, requests are sent with a pooled async HTTP client.
+    A client is bound to the event loop it was created in, so connections are only reused under
+    a server running a single long-lived loop (ASGI), under WSGI every request has its own loop.
+    """
 
-            if not result["success"]:
-                # If it's not a success return False
+    def __init__(self, api_url: str, *args, timeout=None, **kwargs):
+        self.API_URL = api_url
+        self.timeout = timeout or httpx.Timeout(
+            PROVIDER_READ_TIMEOUT, connect=PROVIDER_CONNECT_TIMEOUT
+        )
+        # Async clients are bound to the event loop they were used in
+        self.clients = weakref.WeakKeyDictionary()
+        self.closing_tasks = set()
+        for method_name, endpoint_args in kwargs.items():
+            setattr(
+                self,
+                method_name,
+                self._create_endpoint_method(method_name, endpoint_args),
+            )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+
+        if loop not in self.clients:
+            self.clients[loop] = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=PROVIDER_POOL_SIZE,
+                    max_keepalive_connections=PROVIDER_POOL_SIZE,
+                ),
+            )
+
+        return self.clients[loop]
+
+    def _create_endpoint_method(self, method_name, endpoint_args):
+        async def method(*args, **kwargs):
+            url, params = self._prepare_request(method_name, endpoint_args, kwargs)
+
+            # Make request
+            try:
+                result = (await self.client.get(url, params=params)).json()
+            except (httpx.HTTPError, ValueError):
+                # Unreachable, slow or broken provider is treated as a failure
                 return False
 
-            return result
+            return self._parse_result(result)
 
         return method
 
+    def close(self):
+        """
+        Closes clients of every event loop, each one in its own loop, since close may be called
+        from another thread. Clients of closed loops can't be closed anymore and are dropped.
+        """
+        for loop, client in list(self.clients.items()):
+            if loop.is_closed():
+                continue
+
+            try:
+                loop.call_soon_threadsafe(self.close_client, client)
+            except RuntimeError:
+                # Loop was closed in the meantime
+                pass
+
+        self.clients.clear()
+
+    def close_client(self, client: httpx.AsyncClient):
+        # Running tasks are referenced, so they aren't garbage collected before the client is closed
+        task = asyncio.get_running_loop().create_task(client.aclose())
+        self.closing_tasks.add(task)
+        task.add_done_callback(self.closing_tasks.discard)
+
 
 class MockDriver:
     """
@@ -115,6 +230,27 @@ class MockDriver:
             "rates": rates,
         }
 
+    def timeseries(self, start_date, end_date, base):
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+
+        rates = {}
+
+        while start <= end:
+            rates[str(start)] = {
+                i: self.generate_random_rate() for i in AVAILABLE_CURRENCIES
+            }
+            start = start + timedelta(days=1)
+
+        return {
+            "success": True,
+            "timeseries": True,
+            "start_date": start_date,
+            "end_date": end_date,
+            "base": base,
+            "rates": rates,
+        }
+
     def symbols(self):
         return {
             "success": True,
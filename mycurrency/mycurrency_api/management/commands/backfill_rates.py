@@ -0,0 +1,206 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import transaction
+from datetime import datetime, timedelta
+from functools import partial
+import json
+import os
+import time
+from mycurrency_api.operations import (
+    ProviderScheduler,
+    check_currency,
+    get_exchange_data_range,
+    get_missing_date_ranges,
+    refresh_stored_rates,
+    upsert_exchange_series,
+)
+from mycurrency_api.scheduler import provider_limiters
+
+# Accessing an available currencies and provider concurrency settings from settings
+AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
+PROVIDER_MAX_WORKERS = settings.PROVIDER_MAX_WORKERS
+
+
+class Command(BaseCommand):
+    help = "Fills rates history of every available currency pair from providers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("date_from", type=str, help="First date (YYYY-MM-DD)")
+        parser.add_argument(
+            "date_to",
+            type=str,
+            nargs="?",
+            help="Last date (YYYY-MM-DD), yesterday by default",
+        )
+        parser.add_argument(
+            "--currencies",
+            nargs="+",
+            default=AVAILABLE_CURRENCIES,
+            help="Source currencies to backfill, every available currency by default",
+        )
+        parser.add_argument(
+            "--batch-days",
+            type=int,
+            default=365,
+            help="Number of days asked from a provider with a single range call",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="Number of rates upserted in a single transaction",
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            default="backfill_rates.checkpoint.json",
+            help="File where progress is saved, an interrupted run resumes from it",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore saved progress and start from date_from",
+        )
+
+    def handle(self, *args, **options):
+        date_from = datetime.strptime(options["date_from"], "%Y-%m-%d").date()
+        date_to = (
+            datetime.strptime(options["date_to"], "%Y-%m-%d").date()
+            if options["date_to"]
+            else datetime.now().date() - timedelta(days=1)
+        )
+
+        if date_from > date_to:
+            raise CommandError("date_from must not be later than date_to.")
+
+        for code in options["currencies"]:
+            if code not in AVAILABLE_CURRENCIES:
+                raise CommandError(f"{code} is not in available currencies.")
+
+        self.checkpoint_path = options["checkpoint"]
+        self.checkpoint = self.load_checkpoint(date_from, date_to, options["restart"])
+
+        batch_days = options["batch_days"]
+        windows = [
+            (start, min(start + timedelta(days=batch_days - 1), date_to))
+            for start in (
+                date_from + timedelta(days=i)
+                for i in range(0, (date_to - date_from).days + 1, batch_days)
+            )
+        ]
+
+        self.started_at = time.monotonic()
+        self.rows_count = 0
+        # Requests sent to providers are counted by their limiters, a provider without
+        # range calls is asked once per day
+        self.calls_started = provider_limiters.get_calls_count()
+
+        for code in options["currencies"]:
+            done_date = self.checkpoint["done"].get(code)
+            pending_windows = [x for x in windows if str(x[1]) > (done_date or "")]
+
+            # Windows of a group are fetched concurrently
+            for i in range(0, len(pending_windows), PROVIDER_MAX_WORKERS):
+                group = pending_windows[i : i + PROVIDER_MAX_WORKERS]
+                self.backfill(code, group, options["chunk_size"])
+
+                self.checkpoint["done"][code] = str(group[-1][1])
+                self.save_checkpoint()
+
+        elapsed = time.monotonic() - self.started_at
+        self.stdout.write(
+            f"Backfill finished: {self.rows_count} rates, {self.get_calls_count()} calls "
+            f"in {elapsed:.2f} seconds."
+        )
+
+        os.remove(self.checkpoint_path)
+
+    def backfill(self, code: str, windows: list, chunk_size: int):
+        """
+        Asks providers for the rates of the windows which are not stored yet, upserts them in chunks.
+        """
+        source_currency = check_currency(code)
+        exchanged_currencies = [x for x in AVAILABLE_CURRENCIES if x != code]
+
+        stored_rates = get_exchange_data_range(
+            source_currency, exchanged_currencies, windows[0][0], windows[-1][1]
+        )
+
+        missing_ranges = [
+            date_range
+            for start, end in windows
+            for date_range in get_missing_date_ranges(
+                stored_rates, exchanged_currencies, start, end
+            )
+        ]
+
+        if missing_ranges:
+            series = ProviderScheduler.fetch_series(code, missing_ranges)
+
+            chunk = {}
+            chunk_rows = 0
+
+            for date, rates in series.items():
+                chunk[date] = rates
+                chunk_rows += len(rates)
+
+                if chunk_rows >= chunk_size:
+                    self.store_chunk(source_currency, chunk)
+                    chunk = {}
+                    chunk_rows = 0
+
+            if chunk:
+                self.store_chunk(source_currency, chunk)
+
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        calls_count = self.get_calls_count()
+        self.stdout.write(
+            f"{code} {windows[0][0]} - {windows[-1][1]}: "
+            f"{self.rows_count} rates ({self.rows_count / elapsed:.1f} rates/s), "
+            f"{calls_count} calls ({calls_count / elapsed:.2f} calls/s)"
+        )
+
+    def get_calls_count(self) -> int:
+        return provider_limiters.get_calls_count() - self.calls_started
+
+    def store_chunk(self, source_currency, chunk: dict):
+        with transaction.atomic():
+            stored_series, changed = upsert_exchange_series(source_currency, chunk)
+
+            # Caches are refreshed once rates are committed, a failed chunk leaves them as they were
+            transaction.on_commit(
+                partial(refresh_stored_rates, source_currency, stored_series, changed)
+            )
+
+        self.rows_count += sum(len(x) for x in stored_series.values())
+
+    def load_checkpoint(self, date_from, date_to, restart: bool) -> dict:
+        """
+        Loads saved progress of the run with the same dates, returns last backfilled date by currency code.
+        """
+        checkpoint = {"date_from": str(date_from), "date_to": str(date_to), "done": {}}
+
+        if restart or not os.path.exists(self.checkpoint_path):
+            return checkpoint
+
+        with open(self.checkpoint_path, "r") as f:
+            saved_checkpoint = json.load(f)
+
+        if (
+            saved_checkpoint.get("date_from") != checkpoint["date_from"]
+            or saved_checkpoint.get("date_to") != checkpoint["date_to"]
+        ):
+            # Saved progress belongs to another run
+            return checkpoint
+
+        self.stdout.write(f"Resuming backfill from {self.checkpoint_path}")
+        return saved_checkpoint
+
+    def save_checkpoint(self):
+        # Checkpoint is replaced atomically, so an interrupted run never leaves a broken file
+        temporary_path = f"{self.checkpoint_path}.tmp"
+
+        with open(temporary_path, "w") as f:
+            json.dump(self.checkpoint, f)
+
+        os.replace(temporary_path, self.checkpoint_path)
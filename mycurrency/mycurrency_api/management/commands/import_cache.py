@@ -1,20 +1,41 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 import json
 from django.conf import settings
 from django.core.cache import cache
+from datetime import datetime, timedelta
 import os
+import time
+from mycurrency_api.models import CurrencyExchangeRate
+from mycurrency_api.operations import cache_rates, check_currency
 
 # Accessing an available currencies from settings
 BASE_DIR = settings.BASE_DIR
+CACHE_WARM_DAYS = settings.CACHE_WARM_DAYS
+CACHE_WARM_BATCH_SIZE = settings.CACHE_WARM_BATCH_SIZE
 
 
 class Command(BaseCommand):
-    help = "Closes the specified poll for voting"
+    help = "Loads rates into the cache from a JSON file, or from the database with --warm-days"
 
     def add_arguments(self, parser):
-        parser.add_argument("json_file", nargs="+", type=str)
+        parser.add_argument("json_file", nargs="*", type=str)
+        parser.add_argument(
+            "--warm-days",
+            type=int,
+            nargs="?",
+            const=CACHE_WARM_DAYS,
+            help=f"Cache stored rates of the last N days ({CACHE_WARM_DAYS} by default)",
+        )
 
     def handle(self, *args, **options):
+        if options["warm_days"] is not None:
+            self.warm_cache(options["warm_days"])
+
+        if not options["json_file"]:
+            if options["warm_days"] is None:
+                raise CommandError("Provide a JSON file or --warm-days.")
+            return
+
         json_file = options["json_file"][0]
 
         # Open and parse the JSON file
@@ -25,3 +46,54 @@ class Command(BaseCommand):
 
         for redis_id, rate_value in data.items():
             cache.set(redis_id, rate_value, timeout=60 * 60)
+
+    def warm_cache(self, days: int):
+        """
+        Streams stored rates of the last days from the database, caches them in batches with pipelined writes.
+        """
+        start_date = datetime.now().date() - timedelta(days=days)
+        self.started_at = time.monotonic()
+        self.rows_count = 0
+
+        rates = (
+            CurrencyExchangeRate.objects.filter(valuation_date__gte=start_date)
+            .values_list(
+                "source_currency__code",
+                "exchanged_currency__code",
+                "valuation_date",
+                "rate_value",
+            )
+            .iterator(chunk_size=CACHE_WARM_BATCH_SIZE)
+        )
+
+        batch = {}
+        batch_rows = 0
+
+        for source_code, exchanged_code, date, rate_value in rates:
+            batch.setdefault(source_code, {}).setdefault(str(date), {})[
+                exchanged_code
+            ] = float(rate_value)
+            batch_rows += 1
+
+            if batch_rows >= CACHE_WARM_BATCH_SIZE:
+                self.cache_batch(batch, batch_rows)
+                batch = {}
+                batch_rows = 0
+
+        if batch:
+            self.cache_batch(batch, batch_rows)
+
+        self.stdout.write(
+            f"Cache warm-up finished: {self.rows_count} rates of the last {days} days "
+            f"in {time.monotonic() - self.started_at:.2f} seconds."
+        )
+
+    def cache_batch(self, batch: dict, batch_rows: int):
+        for source_code, series in batch.items():
+            cache_rates(check_currency(source_code), series)
+
+        self.rows_count += batch_rows
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        self.stdout.write(
+            f"Cached {self.rows_count} rates ({self.rows_count / elapsed:.1f} rates/s)"
+        )
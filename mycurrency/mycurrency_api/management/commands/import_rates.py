@@ -0,0 +1,136 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import transaction
+from datetime import date
+from functools import partial
+import csv
+import json
+import os
+import time
+from mycurrency_api.operations import (
+    check_currency,
+    refresh_stored_rates,
+    upsert_exchange_series,
+)
+
+# Accessing an available currencies from settings
+AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
+
+
+def read_json_lines(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_rates(rows):
+    """
+    Parses rows one by one, yields (source code, exchanged code, date, rate) of every available pair.
+    """
+    for row in rows:
+        source_code = row["source_currency"]
+        exchanged_code = row["exchanged_currency"]
+
+        if (
+            source_code == exchanged_code
+            or source_code not in AVAILABLE_CURRENCIES
+            or exchanged_code not in AVAILABLE_CURRENCIES
+        ):
+            continue
+
+        yield (
+            source_code,
+            exchanged_code,
+            str(date.fromisoformat(str(row["valuation_date"]))),
+            round(float(row["rate_value"]), 6),
+        )
+
+
+def read_chunks(rates, chunk_size: int):
+    """
+    Groups rates into chunks of chunk_size rates ({source code: {date: {code: rate}}}),
+    repeated rates of a chunk are merged, the last one wins.
+    """
+    chunk = {}
+    chunk_rows = 0
+
+    for source_code, exchanged_code, valuation_date, rate_value in rates:
+        chunk.setdefault(source_code, {}).setdefault(valuation_date, {})[
+            exchanged_code
+        ] = rate_value
+        chunk_rows += 1
+
+        if chunk_rows >= chunk_size:
+            yield chunk
+            chunk = {}
+            chunk_rows = 0
+
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = "Imports exchange rates from a CSV or JSON lines file into the database and the cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", type=str)
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="File format, guessed from the file extension by default",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=10000,
+            help="Number of rates stored in a single transaction",
+        )
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        file_format = options["format"] or os.path.splitext(path)[1].lstrip(".")
+
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError(f"Unknown file format '{file_format}'.")
+
+        # Every available currency must exist before rates are loaded
+        for code in AVAILABLE_CURRENCIES:
+            check_currency(code)
+
+        started_at = time.monotonic()
+        rows_count = 0
+
+        with open(path, "r", newline="") as f:
+            rows = csv.DictReader(f) if file_format == "csv" else read_json_lines(f)
+
+            for chunk in read_chunks(read_rates(rows), options["chunk_size"]):
+                self.store_chunk(chunk)
+
+                rows_count += sum(
+                    len(x) for series in chunk.values() for x in series.values()
+                )
+                elapsed = max(time.monotonic() - started_at, 1e-9)
+                self.stdout.write(
+                    f"Imported {rows_count} rates ({rows_count / elapsed:.1f} rates/s)"
+                )
+
+        self.stdout.write(
+            f"Import finished: {rows_count} rates "
+            f"in {time.monotonic() - started_at:.2f} seconds."
+        )
+
+    def store_chunk(self, chunk: dict):
+        """
+        Upserts the chunk in a single transaction, rates are cached only once it is committed,
+        so a failed chunk leaves nothing in the cache.
+        """
+        with transaction.atomic():
+            for source_code, series in chunk.items():
+                source_currency = check_currency(source_code)
+                stored_series, changed = upsert_exchange_series(source_currency, series)
+
+                transaction.on_commit(
+                    partial(
+                        refresh_stored_rates, source_currency, stored_series, changed
+                    )
+                )
@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from datetime import datetime, timedelta
+import time
+from mycurrency_api.operations import prefetch_rates
+
+# Accessing prefetch settings
+PREFETCH_RATES_AT = settings.PREFETCH_RATES_AT
+PREFETCH_RATES_RETRY_INTERVAL = settings.PREFETCH_RATES_RETRY_INTERVAL
+
+
+class Command(BaseCommand):
+    help = "Fetches, stores and caches rates of every available currency for the day"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date", type=str, help="Date of the rates (YYYY-MM-DD), today by default"
+        )
+        parser.add_argument(
+            "--schedule",
+            action="store_true",
+            help="Keep running and prefetch rates of every new day",
+        )
+        parser.add_argument(
+            "--at",
+            type=str,
+            default=PREFETCH_RATES_AT,
+            help="Time of the day (HH:MM) when rates are prefetched in schedule mode",
+        )
+
+    def handle(self, *args, **options):
+        if not options["schedule"]:
+            date = (
+                datetime.strptime(options["date"], "%Y-%m-%d").date()
+                if options["date"]
+                else datetime.now().date()
+            )
+
+            try:
+                self.prefetch(date)
+            except Exception as e:
+                raise CommandError(str(e))
+            return
+
+        at = datetime.strptime(options["at"], "%H:%M").time()
+
+        # Rates of the current day are prefetched right away, then every day at the given time
+        run_at = datetime.now()
+
+        while True:
+            time.sleep(max((run_at - datetime.now()).total_seconds(), 0))
+
+            try:
+                self.prefetch(datetime.now().date())
+            except Exception as e:
+                self.stderr.write(
+                    f"Prefetching rates failed: {e}, "
+                    f"retrying in {PREFETCH_RATES_RETRY_INTERVAL} seconds."
+                )
+                run_at = datetime.now() + timedelta(
+                    seconds=PREFETCH_RATES_RETRY_INTERVAL
+                )
+                continue
+
+            run_at = datetime.combine(datetime.now().date() + timedelta(days=1), at)
+
+    def prefetch(self, date):
+        started_at = time.monotonic()
+        stored_count = prefetch_rates(date)
+
+        self.stdout.write(
+            f"Stored {stored_count} rates of {date} "
+            f"in {time.monotonic() - started_at:.2f} seconds."
+        )
@@ -0,0 +1,127 @@
+from collections import deque
+from datetime import datetime
+from django.conf import settings
+from .caching import rates_cache
+from .models import CurrencyExchangeRate
+
+# Accessing derived rates settings
+RATES_PIVOT_CURRENCY = settings.RATES_PIVOT_CURRENCY
+DERIVED_RATES_POLICY = settings.DERIVED_RATES_POLICY
+
+
+def is_derived_rate_allowed(date) -> bool:
+    """
+    Checks derived rates policy, "never" turns triangulation off, "historical" allows derived rates
+    only for past dates, "always" allows them for today too.
+    """
+    if DERIVED_RATES_POLICY == "always":
+        return True
+
+    if DERIVED_RATES_POLICY == "historical":
+        return str(date) < str(datetime.now().date())
+
+    return False
+
+
+def get_matrix_id(date) -> str:
+    """
+    Cache key of the daily rate matrix.
+    """
+    return f"rate-matrix-{RATES_PIVOT_CURRENCY}-{date}"
+
+
+def build_rate_matrix(rows) -> dict:
+    """
+    Builds rates from the pivot currency to every currency reachable through stored rates of the day,
+    rows are (source code, exchanged code, date, rate). Returns rates by date and currency code.
+    """
+    graphs = {}
+
+    for source_code, exchanged_code, date, rate_value in rows:
+        graph = graphs.setdefault(str(date), {})
+        rate_value = float(rate_value)
+
+        graph.setdefault(source_code, {})[exchanged_code] = rate_value
+        # Direct rates take precedence over reversed ones
+        graph.setdefault(exchanged_code, {}).setdefault(source_code, 1 / rate_value)
+
+    matrix = {}
+
+    for date, graph in graphs.items():
+        pivot_rates = {RATES_PIVOT_CURRENCY: 1.0}
+        queue = deque([RATES_PIVOT_CURRENCY])
+
+        while queue:
+            code = queue.popleft()
+
+            for exchanged_code, rate_value in graph.get(code, {}).items():
+                if exchanged_code not in pivot_rates:
+                    pivot_rates[exchanged_code] = pivot_rates[code] * rate_value
+                    queue.append(exchanged_code)
+
+        matrix[date] = pivot_rates
+
+    return matrix
+
+
+def get_rate_matrix(dates: list) -> dict:
+    """
+    Getting daily rate matrices from the local cache, missing days are built from the database with a single query.
+    Returns rates from the pivot currency by date and currency code.
+    """
+    matrix_ids = {get_matrix_id(date): str(date) for date in dates}
+
+    matrix = {
+        matrix_ids[matrix_id]: pivot_rates
+        for matrix_id, pivot_rates in rates_cache.get_many_local(matrix_ids).items()
+    }
+
+    missing_dates = [date for date in matrix_ids.values() if date not in matrix]
+
+    if missing_dates:
+        built_matrix = build_rate_matrix(
+            CurrencyExchangeRate.objects.filter(
+                valuation_date__in=missing_dates
+            ).values_list(
+                "source_currency__code",
+                "exchanged_currency__code",
+                "valuation_date",
+                "rate_value",
+            )
+        )
+
+        # Days without rates are cached too, stored rates invalidate local caches
+        built_matrix = {date: built_matrix.get(date, {}) for date in missing_dates}
+        rates_cache.set_many_local(
+            {get_matrix_id(date): x for date, x in built_matrix.items()}
+        )
+        matrix.update(built_matrix)
+
+    return matrix
+
+
+def get_derived_rates(
+    source_code: str, exchanged_currencies: list, dates: list
+) -> dict:
+    """
+    Deriving exchange rates of the source currency by triangulation through the pivot currency,
+    for dates where derived rates are allowed. Returns rates by date and currency code.
+    """
+    dates = [date for date in dates if is_derived_rate_allowed(date)]
+
+    if not dates:
+        return {}
+
+    rates = {}
+
+    for date, pivot_rates in get_rate_matrix(dates).items():
+        if source_code not in pivot_rates:
+            continue
+
+        for code in exchanged_currencies:
+            if code in pivot_rates:
+                rates.setdefault(date, {})[code] = round(
+                    pivot_rates[code] / pivot_rates[source_code], 6
+                )
+
+    return rates
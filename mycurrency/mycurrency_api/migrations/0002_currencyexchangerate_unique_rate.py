@@ -0,0 +1,45 @@
+# Generated by Django 4.2.11 on 2026-10-18 18:32
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicate_rates(apps, schema_editor):
+    """
+    Keep only the latest stored rate for every pair and date.
+    """
+    CurrencyExchangeRate = apps.get_model("mycurrency_api", "CurrencyExchangeRate")
+
+    latest_ids = (
+        CurrencyExchangeRate.objects.values(
+            "source_currency", "exchanged_currency", "valuation_date"
+        )
+        .annotate(latest_id=Max("id"))
+        .values_list("latest_id", flat=True)
+    )
+
+    # Latest ids are passed as a subquery, so no query parameter is used per pair and date
+    CurrencyExchangeRate.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mycurrency_api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_rates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="currencyexchangerate",
+            name="rate_value",
+            field=models.DecimalField(decimal_places=6, max_digits=18),
+        ),
+        migrations.AddConstraint(
+            model_name="currencyexchangerate",
+            constraint=models.UniqueConstraint(
+                fields=("source_currency", "exchanged_currency", "valuation_date"),
+                name="unique_currency_exchange_rate",
+            ),
+        ),
+    ]
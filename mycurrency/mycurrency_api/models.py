@@ -29,7 +29,15 @@ class CurrencyExchangeRate(models.Model):
     )
     exchanged_currency = models.ForeignKey(Currency, on_delete=models.CASCADE)
     valuation_date = models.DateField(db_index=True)
-    rate_value = models.DecimalField(db_index=True, decimal_places=6, max_digits=18)
+    rate_value = models.DecimalField(decimal_places=6, max_digits=18)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source_currency", "exchanged_currency", "valuation_date"],
+                name="unique_currency_exchange_rate",
+            )
+        ]
 
     def __str__(self):
         return f"{self.source_currency.code} to {self.exchanged_currency.code} at {self.valuation_date}"
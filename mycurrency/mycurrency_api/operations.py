@@ -1,15 +1,135 @@
 from .models import CurrencyExchangeRate, Currency
 from django.conf import settings
 from datetime import datetime, timedelta
-from .adapters import Adapter
-from .serializers import CurrencySerializer, CurrencyExchangeRateSerializer
+from .adapters import Adapter, AsyncAdapter
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
+from django.db.models import Q
+from .caching import cache_stats, rates_cache, response_cache, single_flight
+from .matrix import get_derived_rates, get_matrix_id
+from .registry import currency_registry
+from .scheduler import (
+    AsyncFetchScheduler,
+    FetchScheduler,
+    gather_concurrently,
+    run_concurrently,
+)
+from .twrr import get_growth_series, get_rate_series, get_twrr_series
+import base64
+import json
+import numpy as np
 
 # Accessing an available currencies from settings
 AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
-SYMBOLS = settings.SYMBOLS
+RATES_CACHE_TIMEOUT = settings.RATES_CACHE_TIMEOUT
+RATES_CACHE_HISTORICAL_TIMEOUT = settings.RATES_CACHE_HISTORICAL_TIMEOUT
+RATES_STREAM_CHUNK_DAYS = settings.RATES_STREAM_CHUNK_DAYS
+RATES_MAX_PAGE_SIZE = settings.RATES_MAX_PAGE_SIZE
 
 ProviderAdapter = Adapter()
+ProviderScheduler = FetchScheduler(ProviderAdapter)
+
+AsyncProviderAdapter = AsyncAdapter()
+AsyncProviderScheduler = AsyncFetchScheduler(AsyncProviderAdapter)
+
+
+def get_redis_id(source_code: str, exchanged_code: str, date) -> str:
+    """
+    Cache key of the exchange rate.
+    """
+    return f"{source_code}-to-{exchanged_code}-{date}"
+
+
+def get_cache_timeout(date) -> int:
+    """
+    Rates of past dates never change, so they are cached for a long time, today's rate may still change.
+    """
+    if str(date) < str(datetime.now().date()):
+        return RATES_CACHE_HISTORICAL_TIMEOUT
+    return RATES_CACHE_TIMEOUT
+
+
+def record_cache_stats(hits: int, misses: int) -> None:
+    """
+    Counting rates cache hits and misses to tune cache timeouts, counts are kept in the worker
+    and added to Redis periodically, so cache hits don't leave the worker.
+    """
+    for redis_id, count in (("rates-cache-hits", hits), ("rates-cache-misses", misses)):
+        if count:
+            cache_stats.add(redis_id, count)
+
+
+def get_cache_stats() -> dict:
+    """
+    Returns rates cache hits, misses and hit rate.
+    """
+    cache_stats.flush()
+
+    stats = cache.get_many(["rates-cache-hits", "rates-cache-misses"])
+    hits = stats.get("rates-cache-hits", 0)
+    misses = stats.get("rates-cache-misses", 0)
+
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0,
+    }
+
+
+def get_cached_rates(
+    source_currency: Currency, exchanged_currencies: list, dates: list
+) -> dict:
+    """
+    Getting exchange rates of the source currency for every date and exchanged currency from the local cache,
+    missing ones from Redis with a single round-trip. Returns rates by date and currency code.
+    """
+    redis_ids = {
+        get_redis_id(source_currency.code, code, date): (str(date), code)
+        for date in dates
+        for code in exchanged_currencies
+    }
+
+    rates = {}
+    cached_rates = rates_cache.get_many(redis_ids.keys())
+
+    for redis_id, rate_value in cached_rates.items():
+        date, code = redis_ids[redis_id]
+        rates.setdefault(date, {})[code] = rate_value
+
+    record_cache_stats(len(cached_rates), len(redis_ids) - len(cached_rates))
+
+    return rates
+
+
+def cache_rates(source_currency: Currency, series: dict) -> None:
+    """
+    Saving exchange rates of the source currency ({date: {code: rate}}) in the cache with a single pipeline
+    per timeout.
+    """
+    timeouts = {}
+
+    for date, rates in series.items():
+        redis_ids = timeouts.setdefault(get_cache_timeout(date), {})
+
+        for code, rate_value in rates.items():
+            redis_ids[get_redis_id(source_currency.code, code, date)] = rate_value
+
+    for timeout, redis_ids in timeouts.items():
+        rates_cache.set_many(redis_ids, timeout=timeout)
+
+
+def cache_reversed_rates(source_currency: Currency, series: dict) -> None:
+    """
+    Saving reversed exchange rates of the source currency ({date: {code: rate}}) in the local cache only,
+    so they are dropped with local caches when the stored rate changes, instead of outliving it in Redis.
+    """
+    rates_cache.set_many_local(
+        {
+            get_redis_id(source_currency.code, code, date): rate_value
+            for date, rates in series.items()
+            for code, rate_value in rates.items()
+        }
+    )
 
 
 def store_exchange_data(
@@ -21,18 +141,335 @@ def store_exchange_data(
     """
     Stores exchange rate into the database
     """
-    data = {
-        "source_currency": source_currency.pk,
-        "exchanged_currency": exchanged_currency.pk,
-        "valuation_date": date,
-        "rate_value": rate_value,
+    store_exchange_rates(
+        source_currency, str(date), {exchanged_currency.code: rate_value}
+    )
+
+
+def store_exchange_series(source_currency: Currency, series: dict) -> dict:
+    """
+    Stores every available rate from provider responses ({date: {code: rate}}) into the database
+    with one idempotent query, and caches all of them, returns stored rates by date and currency code.
+    """
+    stored_series, changed = upsert_exchange_series(source_currency, series)
+
+    refresh_stored_rates(source_currency, stored_series, changed)
+
+    return stored_series
+
+
+def upsert_exchange_series(source_currency: Currency, series: dict) -> tuple:
+    """
+    Stores every available rate ({date: {code: rate}}) into the database with one idempotent query,
+    without touching caches. Returns stored rates by date and currency code, and whether
+    any already stored value was changed.
+    """
+    exchange_rates = []
+    stored_series = {}
+
+    for date, rates in series.items():
+        stored_rates = stored_series.setdefault(date, {})
+
+        for code, rate_value in rates.items():
+            if code == source_currency.code or code not in AVAILABLE_CURRENCIES:
+                continue
+
+            rate_value = round(rate_value, 6)
+            stored_rates[code] = rate_value
+
+            exchanged_currency = check_currency(code)
+            if not exchanged_currency:
+                continue
+
+            exchange_rates.append(
+                CurrencyExchangeRate(
+                    source_currency=source_currency,
+                    exchanged_currency=exchanged_currency,
+                    valuation_date=date,
+                    rate_value=rate_value,
+                )
+            )
+
+    # Values which are already stored, only changed values invalidate local caches of every worker
+    stored_values = {
+        (exchanged_code, str(date)): float(rate_value)
+        for exchanged_code, date, rate_value in CurrencyExchangeRate.objects.filter(
+            source_currency=source_currency,
+            valuation_date__in=list(stored_series),
+            exchanged_currency__code__in=list(
+                {code for rates in stored_series.values() for code in rates}
+            ),
+        ).values_list("exchanged_currency__code", "valuation_date", "rate_value")
+    }
+
+    # Upsert, already stored pairs get the latest rate value
+    CurrencyExchangeRate.objects.bulk_create(
+        exchange_rates,
+        update_conflicts=True,
+        unique_fields=["source_currency", "exchanged_currency", "valuation_date"],
+        update_fields=["rate_value"],
+    )
+
+    changed = any(
+        stored_values.get((code, date), rate_value) != rate_value
+        for date, rates in stored_series.items()
+        for code, rate_value in rates.items()
+    )
+
+    return stored_series, changed
+
+
+def refresh_stored_rates(
+    source_currency: Currency, stored_series: dict, changed: bool = True
+) -> None:
+    """
+    Drops everything calculated from re-stored rates ({date: {code: rate}}) and caches the stored ones.
+    """
+    if changed:
+        # Stored values were changed, drop stale copies from local caches of every worker
+        rates_cache.invalidate()
+    else:
+        # New rates only replace derived values (rate matrices of their dates and reversed rates),
+        # other workers drop them when they expire
+        rates_cache.delete_many_local(get_matrix_id(date) for date in stored_series)
+
+    cache_rates(source_currency, stored_series)
+    codes = {source_currency.code} | {
+        x for rates in stored_series.values() for x in rates
     }
+    response_cache.touch(codes, stored_series.keys())
+
+
+def store_exchange_rates(source_currency: Currency, date: str, rates: dict) -> dict:
+    """
+    Stores every available rate from a single provider response into the database with one query,
+    and caches all of them, returns stored rates by currency code.
+    """
+    return store_exchange_series(source_currency, {date: rates})[date]
+
+
+def get_stored_rates_range(
+    source_currency: Currency, exchanged_currencies: list, start_date, end_date
+) -> tuple:
+    """
+    Getting exchange rates of the source currency from start_date to end_date from database with a single query.
+    Returns stored rates and reversed ones (of exchanged currency to source currency pairs) by date and currency code.
+    """
+    rates = {}
+    reversed_rates = {}
+
+    for (
+        source_code,
+        exchanged_code,
+        date,
+        rate_value,
+    ) in CurrencyExchangeRate.objects.filter(
+        Q(
+            source_currency=source_currency,
+            exchanged_currency__code__in=exchanged_currencies,
+        )
+        | Q(
+            source_currency__code__in=exchanged_currencies,
+            exchanged_currency=source_currency,
+        ),
+        valuation_date__range=(start_date, end_date),
+    ).values_list(
+        "source_currency__code",
+        "exchanged_currency__code",
+        "valuation_date",
+        "rate_value",
+    ):
+        if source_code == source_currency.code:
+            rates.setdefault(str(date), {})[exchanged_code] = float(rate_value)
+        else:
+            # Reversed rates are rounded like stored and derived ones
+            reversed_rates.setdefault(str(date), {})[source_code] = round(
+                float(1 / rate_value), 6
+            )
+
+    return rates, reversed_rates
+
+
+def get_exchange_data_range(
+    source_currency: Currency, exchanged_currencies: list, start_date, end_date
+) -> dict:
+    """
+    Getting exchange rates of the source currency from start_date to end_date from database with a single query,
+    reversed rates are used for pairs where only exchanged currency to source currency rate is stored.
+    Returns rates by date and currency code.
+    """
+    rates, reversed_rates = get_stored_rates_range(
+        source_currency, exchanged_currencies, start_date, end_date
+    )
+
+    # Direct rates take precedence over reversed ones
+    for date, date_rates in reversed_rates.items():
+        rates[date] = {**date_rates, **rates.get(date, {})}
+
+    return rates
+
+
+def get_missing_date_ranges(
+    rates: dict, exchanged_currencies: list, start_date, end_date
+) -> list:
+    """
+    Finds date sub-ranges from start_date to end_date where rates are not known for every exchanged currency.
+    """
+    missing_ranges = []
+    range_start = None
+    date = start_date
+
+    while date <= end_date:
+        if not rates.get(str(date), {}).keys() >= set(exchanged_currencies):
+            if range_start is None:
+                range_start = date
+
+        elif range_start is not None:
+            missing_ranges.append((range_start, date - timedelta(days=1)))
+            range_start = None
+
+        date = date + timedelta(days=1)
+
+    if range_start is not None:
+        missing_ranges.append((range_start, end_date))
+
+    return missing_ranges
+
+
+def get_known_rates(
+    source_currency: Currency, exchanged_currencies: list, start_date, end_date
+) -> dict:
+    """
+    Getting exchange rates of the source currency from start_date to end_date, reading the whole window
+    from the cache and database at once. Returns rates by date and currency code.
+    """
+    dates = [
+        start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)
+    ]
+
+    rates = get_cached_rates(source_currency, exchanged_currencies, dates)
+
+    if get_missing_date_ranges(rates, exchanged_currencies, start_date, end_date):
+        # Check in the database rates which are not in the cache
+        stored_rates, reversed_rates = get_stored_rates_range(
+            source_currency, exchanged_currencies, start_date, end_date
+        )
+
+        missed_rates = {}
+        missed_reversed_rates = {}
+
+        # Direct rates take precedence over reversed ones
+        for series, missed_series in (
+            (stored_rates, missed_rates),
+            (reversed_rates, missed_reversed_rates),
+        ):
+            for date, date_rates in series.items():
+                for code, rate_value in date_rates.items():
+                    if code not in rates.get(date, {}):
+                        missed_series.setdefault(date, {})[code] = rate_value
+                        rates.setdefault(date, {})[code] = rate_value
+
+        # Write back cache misses
+        cache_rates(source_currency, missed_rates)
+        cache_reversed_rates(source_currency, missed_reversed_rates)
+
+    missing_ranges = get_missing_date_ranges(
+        rates, exchanged_currencies, start_date, end_date
+    )
 
-    serializer = CurrencyExchangeRateSerializer(data=data)
-    if serializer.is_valid():
-        redis_id = f"{source_currency.code}-to-{exchanged_currency.code}-{date}"
-        cache.set(redis_id, rate_value, timeout=60 * 60)
-        serializer.save()
+    if missing_ranges:
+        # Derive rates which are not stored from the daily rate matrices, instead of asking providers
+        derived_rates = get_derived_rates(
+            source_currency.code,
+            exchanged_currencies,
+            [
+                range_start + timedelta(days=i)
+                for range_start, range_end in missing_ranges
+                for i in range((range_end - range_start).days + 1)
+            ],
+        )
+
+        # Known rates take precedence over derived ones
+        for date, date_rates in derived_rates.items():
+            rates[date] = {**date_rates, **rates.get(date, {})}
+
+    return rates
+
+
+def merge_stored_series(rates: dict, stored_series: dict) -> dict:
+    """
+    Adds rates gathered from providers to already known rates, just stored rates take precedence
+    over reversed and derived ones.
+    """
+    for date, stored_rates in stored_series.items():
+        rates[date] = {**rates.get(date, {}), **stored_rates}
+
+    return rates
+
+
+def get_rates_range(
+    source_currency: Currency,
+    exchanged_currencies: list,
+    start_date,
+    end_date,
+    *args,
+    **kwargs,
+) -> dict:
+    """
+    Gathering exchange rates of the source currency from start_date to end_date, reading the whole window
+    from the cache and database at once, only truly missing rates are gathered from providers.
+    Returns rates by date and currency code.
+    """
+    rates = get_known_rates(source_currency, exchanged_currencies, start_date, end_date)
+
+    # Ask providers for every missing date sub-range with a single range call, ranges are fetched concurrently
+    missing_ranges = get_missing_date_ranges(
+        rates, exchanged_currencies, start_date, end_date
+    )
+
+    if missing_ranges:
+        provider_series = ProviderScheduler.fetch_series(
+            source_currency.code, missing_ranges, *args, **kwargs
+        )
+
+        stored_series = store_exchange_series(source_currency, provider_series)
+
+        merge_stored_series(rates, stored_series)
+
+    return rates
+
+
+async def aget_rates_range(
+    source_currency: Currency,
+    exchanged_currencies: list,
+    start_date,
+    end_date,
+    *args,
+    **kwargs,
+) -> dict:
+    """
+    Async version of get_rates_range, missing rates are awaited from providers without blocking the worker.
+    """
+    rates = await sync_to_async(get_known_rates)(
+        source_currency, exchanged_currencies, start_date, end_date
+    )
+
+    missing_ranges = get_missing_date_ranges(
+        rates, exchanged_currencies, start_date, end_date
+    )
+
+    if missing_ranges:
+        provider_series = await AsyncProviderScheduler.fetch_series(
+            source_currency.code, missing_ranges, *args, **kwargs
+        )
+
+        stored_series = await sync_to_async(store_exchange_series)(
+            source_currency, provider_series
+        )
+
+        merge_stored_series(rates, stored_series)
+
+    return rates
 
 
 def get_exchange_data(
@@ -45,68 +482,81 @@ def get_exchange_data(
     1/rate_value for exchanged to source transaction. Using this method we can store half as data into the database.
     """
     # Check in the cache
-    redis_id = f"{source_currency.code}-to-{exchanged_currency.code}-{date}"
+    redis_id = get_redis_id(source_currency.code, exchanged_currency.code, date)
 
-    rate_value = cache.get(redis_id)
+    rate_value = rates_cache.get(redis_id)
 
     if rate_value:
+        record_cache_stats(1, 0)
         return rate_value
 
+    record_cache_stats(0, 1)
+
     # If not in cache, check in the database
-    rate = CurrencyExchangeRate.objects.filter(
-        source_currency=source_currency,
-        exchanged_currency=exchanged_currency,
-        valuation_date=date,
+    stored_rates, reversed_rates = get_stored_rates_range(
+        source_currency, [exchanged_currency.code], date, date
     )
+    rate_value = stored_rates.get(str(date), {}).get(exchanged_currency.code)
 
-    if rate.exists():
-        rate_value = float(rate.first().rate_value)
-
-    reversed_rate = CurrencyExchangeRate.objects.filter(
-        source_currency=exchanged_currency,
-        exchanged_currency=source_currency,
-        valuation_date=date,
-    )
+    if rate_value:
+        # Save it in the cache
+        rates_cache.set(redis_id, rate_value, timeout=get_cache_timeout(date))
+        return rate_value
 
-    if reversed_rate.exists():
-        rate_value = float(1 / reversed_rate.first().rate_value)
+    rate_value = reversed_rates.get(str(date), {}).get(exchanged_currency.code)
 
     if rate_value:
-        # Save it in the cache
-        cache.set(redis_id, rate_value, timeout=60 * 60)
+        cache_reversed_rates(
+            source_currency, {str(date): {exchanged_currency.code: rate_value}}
+        )
         return rate_value
 
+    # If not in the database, derive it through the pivot currency
+    return (
+        get_derived_rates(source_currency.code, [exchanged_currency.code], [date])
+        .get(str(date), {})
+        .get(exchanged_currency.code)
+    )
 
-def check_currency(symbol: str) -> Currency:
+
+def prefetch_rates(date, *args, **kwargs) -> int:
     """
-    In case of founding non-familiar currency which is available, checks with providers if it's possible to gather
-    more data about this currency.
+    Gathering rates of the date for every available currency from providers at once, storing and caching them,
+    so requests of the day don't wait for providers. Returns number of stored rates.
     """
-    currency_inst = Currency.objects.filter(code=symbol).first()
+    source_currencies = [check_currency(x) for x in AVAILABLE_CURRENCIES]
 
-    if not currency_inst:
-        symbols = ProviderAdapter.get_currency_symbols()["symbols"]
+    # Providers are loaded in the calling thread, workers only make HTTP requests
+    ProviderAdapter.update_adapters()
 
-        # This currency is supported
-        data = {
-            "code": symbol,
-            "name": symbols[symbol],
-            "symbol": SYMBOLS[AVAILABLE_CURRENCIES.index(symbol)],
-        }
-        serializer = CurrencySerializer(data=data)
-        if serializer.is_valid():
-            currency_inst = serializer.save()
+    provider_series = run_concurrently(
+        lambda source_currency: ProviderScheduler.fetch_series(
+            source_currency.code, [(date, date)], *args, **kwargs
+        ),
+        source_currencies,
+    )
 
-    return currency_inst
+    stored_count = 0
 
+    for source_currency, series in zip(source_currencies, provider_series):
+        stored_series = store_exchange_series(source_currency, series)
+        stored_count += sum(len(x) for x in stored_series.values())
 
-def get_currency_rates(
-    source_currency: list, date_from: list, date_to: list, *args, **kwargs
-) -> dict:
+    return stored_count
+
+
+def check_currency(symbol: str) -> Currency:
     """
-    Gathering a currency rates from date_from to date_to for every available currencies.
+    Getting currency from the currency registry, non-familiar available currencies are created
+    with a single providers call when registry is loaded.
     """
+    return currency_registry.get(symbol)
 
+
+def parse_rates_query(source_currency: list, date_from: list, date_to: list) -> tuple:
+    """
+    Checks rates query, returns source currency, target currencies and the date window.
+    """
     # Upack variables
     source_currency = source_currency[0]
     date_from = date_from[0]
@@ -121,59 +571,233 @@ def get_currency_rates(
     source_currency = check_currency(source_currency)
 
     # Turn string dates into datetime
-    start = datetime(*[int(i) for i in date_from.split("-")]).date() - timedelta(days=1)
+    start = datetime(*[int(i) for i in date_from.split("-")]).date()
     end = datetime(*[int(i) for i in date_to.split("-")]).date()
 
-    final_rates = {}
+    if start > end:
+        raise ValueError("date_from must not be after date_to.")
 
-    while start != end:
-        # for every date from start date to end date
-        start = start + timedelta(days=1)
-        date = str(start)
-        for exchanged_currency in target_currencies:
-            exchanged_currency = check_currency(exchanged_currency)
-            if exchanged_currency:
-                # Check in Database
-                rate_value = get_exchange_data(
-                    source_currency, exchanged_currency, date
-                )
+    return source_currency, target_currencies, start, end
 
-                if not rate_value:
-                    # Ask provider if it exists in the Database
-                    provider_data = ProviderAdapter.get_exchange_rate_data(
-                        source_currency.code,
-                        exchanged_currency.code,
-                        date,
-                        *args,
-                        **kwargs,
-                    )
-
-                    rate_value = round(
-                        provider_data["rates"][exchanged_currency.code], 6
-                    )
-
-                    store_exchange_data(
-                        source_currency, exchanged_currency, date, rate_value
-                    )
-
-                if not final_rates.get(date, False):
-                    final_rates[date] = {exchanged_currency.code: rate_value}
-                else:
-                    final_rates[date].update({exchanged_currency.code: rate_value})
+
+def format_currency_rates(
+    source_currency: Currency,
+    target_currencies: list,
+    start,
+    end,
+    rates: dict,
+    date_from: list,
+    date_to: list,
+) -> dict:
+    """
+    Builds rates response for every date from start to end.
+    """
+    date_from = date_from[0]
+    date_to = date_to[0]
 
     return {
         "source_currency": str(source_currency.code),
         "date_from": str(date_from),
         "date_to": str(date_to),
-        "rates": final_rates,
+        "rates": dict(iter_dates_rates(target_currencies, start, end, rates)),
     }
 
 
-def get_converted_data(
-    source_currency: list, amount: list, exchanged_currency: list, *args, **kwargs
+def iter_dates_rates(target_currencies: list, start, end, rates: dict):
+    """
+    Yields (date, rates) for every date from start to end.
+    """
+    start = start - timedelta(days=1)
+
+    while start != end:
+        # for every date from start date to end date
+        start = start + timedelta(days=1)
+        date_rates = rates.get(str(start), {})
+
+        yield str(start), {
+            x: date_rates[x] for x in target_currencies if x in date_rates
+        }
+
+
+def get_currency_rates(
+    source_currency: list, date_from: list, date_to: list, *args, **kwargs
 ) -> dict:
     """
-    Converts amount of money from source currency to exchanged currency.
+    Gathering a currency rates from date_from to date_to for every available currencies.
+    """
+    source, targets, start, end = parse_rates_query(source_currency, date_from, date_to)
+
+    rates = get_rates_range(source, targets, start, end, *args, **kwargs)
+
+    return format_currency_rates(source, targets, start, end, rates, date_from, date_to)
+
+
+async def aget_currency_rates(
+    source_currency: list, date_from: list, date_to: list, *args, **kwargs
+) -> dict:
+    """
+    Async version of get_currency_rates.
+    """
+    source, targets, start, end = await sync_to_async(parse_rates_query)(
+        source_currency, date_from, date_to
+    )
+
+    rates = await aget_rates_range(source, targets, start, end, *args, **kwargs)
+
+    return format_currency_rates(source, targets, start, end, rates, date_from, date_to)
+
+
+def encode_rates_cursor(date) -> str:
+    return base64.urlsafe_b64encode(str(date).encode()).decode()
+
+
+def decode_rates_cursor(cursor: str):
+    try:
+        cursor = base64.urlsafe_b64decode(cursor.encode()).decode()
+        return datetime(*[int(i) for i in cursor.split("-")]).date()
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+
+
+def parse_rates_page(start, end, page_size: list, cursor: list = None) -> tuple:
+    """
+    Checks page query, returns first and last date of the page and first date of the next page, if any.
+    """
+    page_size = int(page_size[0])
+
+    if not 0 < page_size <= RATES_MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {RATES_MAX_PAGE_SIZE}.")
+
+    page_start = decode_rates_cursor(cursor[0]) if cursor else start
+
+    if not start <= page_start <= end:
+        raise ValueError("Invalid cursor.")
+
+    page_end = min(page_start + timedelta(days=page_size - 1), end)
+    next_start = page_end + timedelta(days=1) if page_end < end else None
+
+    return page_start, page_end, next_start
+
+
+async def aget_currency_rates_page(
+    source_currency: list,
+    date_from: list,
+    date_to: list,
+    page_size: list,
+    cursor: list = None,
+    *args,
+    **kwargs,
+) -> dict:
+    """
+    Gathering a page of page_size days of a currency rates, the cursor of the next page is returned
+    with the rates, no more than a page of rates is held in memory.
+    """
+    source, targets, start, end = await sync_to_async(parse_rates_query)(
+        source_currency, date_from, date_to
+    )
+    page_start, page_end, next_start = parse_rates_page(start, end, page_size, cursor)
+
+    rates = await aget_rates_range(
+        source, targets, page_start, page_end, *args, **kwargs
+    )
+
+    currency_rates = format_currency_rates(
+        source, targets, page_start, page_end, rates, date_from, date_to
+    )
+    currency_rates["next_cursor"] = (
+        encode_rates_cursor(next_start) if next_start else None
+    )
+
+    return currency_rates
+
+
+def dump_json(data) -> str:
+    return json.dumps(data, separators=(",", ":"))
+
+
+async def aget_currency_rates_stream(
+    source_currency: list,
+    date_from: list,
+    date_to: list,
+    stream: list,
+    *args,
+    **kwargs,
+):
+    """
+    Checks rates query and returns an async iterator of the response, rates are gathered
+    RATES_STREAM_CHUNK_DAYS days at once, so memory use doesn't grow with the date window.
+    Stream is either "ndjson" (one {"date", "rates"} line per date) or "json" (rates response in chunks).
+    """
+    stream = stream[0]
+
+    if stream not in ("ndjson", "json"):
+        raise ValueError(f"Unknown stream format '{stream}'.")
+
+    source, targets, start, end = await sync_to_async(parse_rates_query)(
+        source_currency, date_from, date_to
+    )
+
+    async def iter_chunks():
+        chunk_start = start
+        separator = ""
+
+        if stream == "json":
+            yield (
+                dump_json(
+                    {
+                        "source_currency": source.code,
+                        "date_from": date_from[0],
+                        "date_to": date_to[0],
+                    }
+                )[:-1]
+                + ',"rates":{'
+            )
+
+        try:
+            while chunk_start <= end:
+                chunk_end = min(
+                    chunk_start + timedelta(days=RATES_STREAM_CHUNK_DAYS - 1), end
+                )
+                rates = await aget_rates_range(
+                    source, targets, chunk_start, chunk_end, *args, **kwargs
+                )
+
+                lines = []
+
+                for date, date_rates in iter_dates_rates(
+                    targets, chunk_start, chunk_end, rates
+                ):
+                    if stream == "ndjson":
+                        lines.append(
+                            dump_json({"date": date, "rates": date_rates}) + "\n"
+                        )
+                    else:
+                        lines.append(
+                            f"{separator}{dump_json(date)}:{dump_json(date_rates)}"
+                        )
+                        separator = ","
+
+                yield "".join(lines)
+                chunk_start = chunk_end + timedelta(days=1)
+        except Exception as e:
+            # Status is already sent, the error ends the stream
+            if stream == "ndjson":
+                yield dump_json({"error": str(e)}) + "\n"
+            else:
+                yield f'}},"error":{dump_json(str(e))}}}'
+            return
+
+        if stream == "json":
+            yield "}}"
+
+    return iter_chunks()
+
+
+def parse_convert_query(
+    source_currency: list, amount: list, exchanged_currency: list
+) -> tuple:
+    """
+    Checks convert query, returns source currency, exchanged currency and amount.
     """
     # Upack variables
     source_currency = source_currency[0]
@@ -190,21 +814,20 @@ def get_converted_data(
     source_currency = check_currency(source_currency)
     exchanged_currency = check_currency(exchanged_currency)
 
-    # Get today's date
-    date = datetime.now().date()
+    return source_currency, exchanged_currency, amount
 
-    rate_value = get_exchange_data(source_currency, exchanged_currency, date)
-
-    if not rate_value:
-        # Ask provider to convert currencies if rate value is not in database
-        converted_data = ProviderAdapter.convert_currencies(
-            source_currency.code, exchanged_currency.code, amount, *args, **kwargs
-        )
-
-        rate_value = round(converted_data["info"]["rate"], 6)
-
-        store_exchange_data(source_currency, exchanged_currency, date, rate_value)
 
+def format_converted_data(
+    source_currency: Currency,
+    exchanged_currency: Currency,
+    amount: float,
+    rate_value: float,
+    converted_data: dict,
+) -> dict:
+    """
+    Builds convert response, provider's result is used if provider was asked.
+    """
+    if converted_data:
         converted_amount = converted_data["result"]
 
     else:
@@ -219,16 +842,374 @@ def get_converted_data(
     }
 
 
-def get_twrr_values(
-    source_currency: list,
-    amount: list,
-    exchanged_currency: list,
-    start_date: list,
-    *args,
-    **kwargs,
+def get_converted_data(
+    source_currency: list, amount: list, exchanged_currency: list, *args, **kwargs
 ) -> dict:
     """
-    Calculates TWRR for the amount transacted from source_currency to exchanged_currency at start_date to today.
+    Converts amount of money from source currency to exchanged currency.
+    """
+    source_currency, exchanged_currency, amount = parse_convert_query(
+        source_currency, amount, exchanged_currency
+    )
+
+    # Get today's date
+    date = datetime.now().date()
+
+    rate_value = get_exchange_data(source_currency, exchanged_currency, date)
+    converted_data = {}
+
+    if not rate_value:
+
+        def convert_currencies():
+            # Ask provider to convert currencies if rate value is not in database
+            converted_data.update(
+                ProviderAdapter.convert_currencies(
+                    source_currency.code,
+                    exchanged_currency.code,
+                    amount,
+                    *args,
+                    **kwargs,
+                )
+            )
+
+            rate_value = round(converted_data["info"]["rate"], 6)
+
+            store_exchange_data(source_currency, exchanged_currency, date, rate_value)
+
+            return rate_value
+
+        # Identical concurrent misses are coalesced, only one caller asks the provider
+        redis_id = get_redis_id(source_currency.code, exchanged_currency.code, date)
+        rate_value = single_flight.run(
+            redis_id, lambda: rates_cache.get(redis_id), convert_currencies
+        )
+
+    return format_converted_data(
+        source_currency, exchanged_currency, amount, rate_value, converted_data
+    )
+
+
+async def aget_converted_data(
+    source_currency: list, amount: list, exchanged_currency: list, *args, **kwargs
+) -> dict:
+    """
+    Async version of get_converted_data.
+    """
+    source_currency, exchanged_currency, amount = await sync_to_async(
+        parse_convert_query
+    )(source_currency, amount, exchanged_currency)
+
+    # Get today's date
+    date = datetime.now().date()
+
+    rate_value = await sync_to_async(get_exchange_data)(
+        source_currency, exchanged_currency, date
+    )
+    converted_data = {}
+
+    if not rate_value:
+
+        async def convert_currencies():
+            # Ask provider to convert currencies if rate value is not in database
+            converted_data.update(
+                await AsyncProviderAdapter.convert_currencies(
+                    source_currency.code,
+                    exchanged_currency.code,
+                    amount,
+                    *args,
+                    **kwargs,
+                )
+            )
+
+            rate_value = round(converted_data["info"]["rate"], 6)
+
+            await sync_to_async(store_exchange_data)(
+                source_currency, exchanged_currency, date, rate_value
+            )
+
+            return rate_value
+
+        # Identical concurrent misses are coalesced, only one caller asks the provider
+        redis_id = get_redis_id(source_currency.code, exchanged_currency.code, date)
+        rate_value = await single_flight.arun(
+            redis_id,
+            sync_to_async(lambda: rates_cache.get(redis_id)),
+            convert_currencies,
+        )
+
+    return format_converted_data(
+        source_currency, exchanged_currency, amount, rate_value, converted_data
+    )
+
+
+def parse_convert_items(items: list) -> list:
+    """
+    Checks every item of the batch, returns (source currency, exchanged currency, amount) of every valid item,
+    or error of the invalid one, in the order of items.
+    """
+    parsed_items = []
+
+    for item in items:
+        if not isinstance(item, dict):
+            parsed_items.append({"error": "Item must be an object."})
+            continue
+
+        source_code = item.get("source_currency")
+        exchanged_code = item.get("exchanged_currency")
+        error = {"source_currency": source_code, "exchanged_currency": exchanged_code}
+
+        missing_names = [
+            x
+            for x in ["source_currency", "exchanged_currency", "amount"]
+            if x not in item
+        ]
+
+        if missing_names:
+            parsed_items.append({"error": f"Missing '{missing_names[0]}'.", **error})
+            continue
+
+        unavailable_codes = [
+            x for x in (source_code, exchanged_code) if x not in AVAILABLE_CURRENCIES
+        ]
+
+        if unavailable_codes:
+            parsed_items.append(
+                {
+                    "error": f"{unavailable_codes[0]} is not in available currencies.",
+                    **error,
+                }
+            )
+            continue
+
+        try:
+            amount = float(item["amount"])
+        except (TypeError, ValueError):
+            parsed_items.append(
+                {"error": f"'{item['amount']}' is not a valid amount.", **error}
+            )
+            continue
+
+        parsed_items.append(
+            (check_currency(source_code), check_currency(exchanged_code), amount)
+        )
+
+    return parsed_items
+
+
+def get_pair_rates(pairs: set, date) -> dict:
+    """
+    Getting rates of every (source code, exchanged code) pair of the date from the cache with a single round-trip,
+    missing ones from database with a single query, then from the rate matrix. Returns rates by pair.
+    """
+    redis_ids = {get_redis_id(*pair, date): pair for pair in pairs}
+
+    rates = {
+        redis_ids[redis_id]: rate_value
+        for redis_id, rate_value in rates_cache.get_many(redis_ids.keys()).items()
+    }
+
+    record_cache_stats(len(rates), len(pairs) - len(rates))
+
+    missing_pairs = pairs - rates.keys()
+
+    if missing_pairs:
+        codes = {code for pair in missing_pairs for code in pair}
+        stored_rates = {
+            (source_code, exchanged_code): float(rate_value)
+            for source_code, exchanged_code, rate_value in CurrencyExchangeRate.objects.filter(
+                source_currency__code__in=codes,
+                exchanged_currency__code__in=codes,
+                valuation_date=date,
+            ).values_list(
+                "source_currency__code", "exchanged_currency__code", "rate_value"
+            )
+        }
+
+        missed_rates = {}
+        missed_reversed_rates = {}
+
+        for source_code, exchanged_code in missing_pairs:
+            rate_value = stored_rates.get((source_code, exchanged_code))
+
+            if rate_value is not None:
+                rates[(source_code, exchanged_code)] = rate_value
+                missed_rates.setdefault(source_code, {})[exchanged_code] = rate_value
+
+            elif (exchanged_code, source_code) in stored_rates:
+                rate_value = round(
+                    float(1 / stored_rates[(exchanged_code, source_code)]), 6
+                )
+                rates[(source_code, exchanged_code)] = rate_value
+                missed_reversed_rates.setdefault(source_code, {})[
+                    exchanged_code
+                ] = rate_value
+
+        # Write back cache misses
+        for source_code, missed in missed_rates.items():
+            cache_rates(check_currency(source_code), {str(date): missed})
+        for source_code, missed in missed_reversed_rates.items():
+            cache_reversed_rates(check_currency(source_code), {str(date): missed})
+
+    missing_pairs = pairs - rates.keys()
+
+    for source_code in {x[0] for x in missing_pairs}:
+        # Derive rates which are not stored through the pivot currency
+        derived_rates = get_derived_rates(
+            source_code,
+            [x[1] for x in missing_pairs if x[0] == source_code],
+            [date],
+        ).get(str(date), {})
+
+        for exchanged_code, rate_value in derived_rates.items():
+            rates[(source_code, exchanged_code)] = rate_value
+
+    return rates
+
+
+def prepare_converted_batch(items: list, date) -> tuple:
+    """
+    Checks items of the batch and gathers every known rate of the date at once,
+    returns parsed items, rates by pair and source currencies which rates must be gathered from providers.
+    """
+    parsed_items = parse_convert_items(items)
+
+    pairs = {
+        (x[0].code, x[1].code)
+        for x in parsed_items
+        if isinstance(x, tuple) and x[0] != x[1]
+    }
+
+    rates = get_pair_rates(pairs, date)
+
+    missing_sources = sorted({x[0] for x in pairs - rates.keys()})
+
+    return parsed_items, rates, missing_sources
+
+
+def complete_converted_batch(
+    parsed_items: list, rates: dict, provider_series: dict, date
+) -> dict:
+    """
+    Stores rates gathered from providers ({source code: series or exception}) and converts every item of the batch.
+    """
+    errors = {}
+
+    for source_code, series in provider_series.items():
+        if isinstance(series, Exception):
+            errors[source_code] = str(series)
+            continue
+
+        stored_series = store_exchange_series(check_currency(source_code), series)
+
+        for exchanged_code, rate_value in stored_series.get(str(date), {}).items():
+            rates.setdefault((source_code, exchanged_code), rate_value)
+
+    results = []
+
+    for item in parsed_items:
+        if isinstance(item, dict):
+            results.append(item)
+            continue
+
+        source_currency, exchanged_currency, amount = item
+
+        if source_currency == exchanged_currency:
+            rate_value = 1.0
+        else:
+            rate_value = rates.get((source_currency.code, exchanged_currency.code))
+
+        if rate_value is None:
+            results.append(
+                {
+                    "error": errors.get(
+                        source_currency.code, "Rate value is not available."
+                    ),
+                    "source_currency": source_currency.code,
+                    "exchanged_currency": exchanged_currency.code,
+                }
+            )
+            continue
+
+        results.append(
+            format_converted_data(
+                source_currency, exchanged_currency, amount, rate_value, {}
+            )
+        )
+
+    return {"results": results}
+
+
+def fetch_date_series(source_code: str, date, *args, **kwargs):
+    """
+    Gathering rates of the source currency for the date from providers, returns the exception if providers failed.
+    """
+    try:
+        return ProviderScheduler.fetch_series(
+            source_code, [(date, date)], *args, **kwargs
+        )
+    except Exception as e:
+        return e
+
+
+async def afetch_date_series(source_code: str, date, *args, **kwargs):
+    """
+    Async version of fetch_date_series.
+    """
+    try:
+        return await AsyncProviderScheduler.fetch_series(
+            source_code, [(date, date)], *args, **kwargs
+        )
+    except Exception as e:
+        return e
+
+
+def get_converted_batch(items: list, *args, **kwargs) -> dict:
+    """
+    Converts every (source_currency, exchanged_currency, amount) item of the batch, rates are gathered with
+    a single lookup and missing ones with a single provider call per source currency.
+    Returns result or error of every item in the order of items.
+    """
+    # Get today's date
+    date = datetime.now().date()
+
+    parsed_items, rates, missing_sources = prepare_converted_batch(items, date)
+
+    provider_series = run_concurrently(
+        lambda source_code: fetch_date_series(source_code, date, *args, **kwargs),
+        missing_sources,
+    )
+
+    return complete_converted_batch(
+        parsed_items, rates, dict(zip(missing_sources, provider_series)), date
+    )
+
+
+async def aget_converted_batch(items: list, *args, **kwargs) -> dict:
+    """
+    Async version of get_converted_batch.
+    """
+    # Get today's date
+    date = datetime.now().date()
+
+    parsed_items, rates, missing_sources = await sync_to_async(prepare_converted_batch)(
+        items, date
+    )
+
+    provider_series = await gather_concurrently(
+        lambda source_code: afetch_date_series(source_code, date, *args, **kwargs),
+        missing_sources,
+    )
+
+    return await sync_to_async(complete_converted_batch)(
+        parsed_items, rates, dict(zip(missing_sources, provider_series)), date
+    )
+
+
+def parse_twrr_query(
+    source_currency: list, amount: list, exchanged_currency: list, start_date: list
+) -> tuple:
+    """
+    Checks TWRR query, returns source currency, exchanged currency, amount and start date.
     """
     # Upack variables
     source_currency = source_currency[0]
@@ -246,49 +1227,38 @@ def get_twrr_values(
     source_currency = check_currency(source_currency)
     exchanged_currency = check_currency(exchanged_currency)
 
-    # Get today's date
-    date = datetime.now().date()
-
-    start = datetime(*[int(i) for i in start_date.split("-")]).date() - timedelta(
-        days=1
-    )
+    start = datetime(*[int(i) for i in start_date.split("-")]).date()
 
-    initial_value = 0
+    if start > datetime.now().date():
+        raise ValueError("start_date must not be after today.")
 
-    twr_plus_one = 1
+    return source_currency, exchanged_currency, amount, start
 
-    twrr_values = dict()
 
-    while start != date:
-        start = start + timedelta(days=1)
-        rate_value = get_exchange_data(source_currency, exchanged_currency, str(start))
-
-        if not rate_value:
-            provider_data = ProviderAdapter.get_exchange_rate_data(
-                source_currency.code,
-                exchanged_currency.code,
-                str(start),
-                *args,
-                **kwargs,
-            )
-
-            rate_value = round(provider_data["rates"][exchanged_currency.code], 6)
-
-            store_exchange_data(
-                source_currency, exchanged_currency, str(start), rate_value
-            )
-
-        if str(start) == start_date:
-            initial_value = round(amount * rate_value, 6)
-
-        # Formula for calculating TWRR
-        exchanged_value = round(amount * rate_value, 6)
+def calculate_twrr_values(
+    source_currency: Currency,
+    exchanged_currency: Currency,
+    amount: float,
+    start,
+    date,
+    rates: dict,
+) -> dict:
+    """
+    Calculates TWRR for every date from start to date from log growth of the rates, builds TWRR response.
+    """
+    start_date = str(start)
 
-        sub_period = round((exchanged_value - initial_value) / initial_value, 6)
+    growth_series = get_growth_series(
+        get_rate_series(rates, exchanged_currency.code, start, date)
+    )
 
-        twr = round((twr_plus_one * (1 + sub_period)) - 1, 6)
+    # Whole window is calculated at once, values are rounded only for the response
+    twrr_series = np.round(get_twrr_series(growth_series), 6)
 
-        twrr_values[str(start)] = twr
+    twrr_values = {
+        str(start + timedelta(days=i)): twr
+        for i, twr in enumerate(twrr_series.tolist())
+    }
 
     return {
         "source_currency": str(source_currency.code),
@@ -297,3 +1267,59 @@ def get_twrr_values(
         "start_date": str(start_date),
         "result": twrr_values,
     }
+
+
+def get_twrr_values(
+    source_currency: list,
+    amount: list,
+    exchanged_currency: list,
+    start_date: list,
+    *args,
+    **kwargs,
+) -> dict:
+    """
+    Calculates TWRR for the amount transacted from source_currency to exchanged_currency at start_date to today.
+    """
+    source_currency, exchanged_currency, amount, start = parse_twrr_query(
+        source_currency, amount, exchanged_currency, start_date
+    )
+
+    # Get today's date
+    date = datetime.now().date()
+
+    # Rates of the whole window are read at once
+    rates = get_rates_range(
+        source_currency, [exchanged_currency.code], start, date, *args, **kwargs
+    )
+
+    return calculate_twrr_values(
+        source_currency, exchanged_currency, amount, start, date, rates
+    )
+
+
+async def aget_twrr_values(
+    source_currency: list,
+    amount: list,
+    exchanged_currency: list,
+    start_date: list,
+    *args,
+    **kwargs,
+) -> dict:
+    """
+    Async version of get_twrr_values.
+    """
+    source_currency, exchanged_currency, amount, start = await sync_to_async(
+        parse_twrr_query
+    )(source_currency, amount, exchanged_currency, start_date)
+
+    # Get today's date
+    date = datetime.now().date()
+
+    # Rates of the whole window are read at once
+    rates = await aget_rates_range(
+        source_currency, [exchanged_currency.code], start, date, *args, **kwargs
+    )
+
+    return calculate_twrr_values(
+        source_currency, exchanged_currency, amount, start, date, rates
+    )
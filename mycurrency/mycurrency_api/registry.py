@@ -0,0 +1,80 @@
+import threading
+from django.conf import settings
+from .adapters import Adapter
+from .models import Currency
+
+# Accessing an available currencies from settings
+AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
+SYMBOLS = settings.SYMBOLS
+
+
+class CurrencyRegistry:
+    """
+    Process-wide registry of available currencies (code -> Currency), loaded once with a single query
+    and kept until it is explicitly invalidated.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.currencies = None
+        self.lock = threading.Lock()
+
+    def load(self) -> dict:
+        """
+        Load available currencies, currencies which don't exist yet are created with one symbols fetch.
+        """
+        with self.lock:
+            if self.currencies is not None:
+                return self.currencies
+
+            currencies = {
+                x.code: x
+                for x in Currency.objects.filter(code__in=AVAILABLE_CURRENCIES)
+            }
+
+            missing_codes = [x for x in AVAILABLE_CURRENCIES if x not in currencies]
+
+            if missing_codes:
+                currencies.update(self.create_currencies(missing_codes))
+
+            self.currencies = currencies
+            return currencies
+
+    def create_currencies(self, codes: list) -> dict:
+        """
+        Checks with providers if it's possible to gather more data about non-familiar available currencies,
+        and creates all of them at once.
+        """
+        symbols = self.adapter.get_currency_symbols()["symbols"]
+
+        Currency.objects.bulk_create(
+            [
+                Currency(
+                    code=code,
+                    name=symbols[code],
+                    symbol=SYMBOLS[AVAILABLE_CURRENCIES.index(code)],
+                )
+                # Only currencies supported by providers
+                for code in codes
+                if code in symbols
+            ],
+            ignore_conflicts=True,
+        )
+
+        return {x.code: x for x in Currency.objects.filter(code__in=codes)}
+
+    def get(self, code: str) -> Currency:
+        currencies = self.currencies
+        if currencies is None:
+            currencies = self.load()
+        return currencies.get(code)
+
+    def invalidate(self, *args, **kwargs):
+        """
+        Drop loaded currencies, they are loaded again on the next access.
+        """
+        with self.lock:
+            self.currencies = None
+
+
+currency_registry = CurrencyRegistry(Adapter())
@@ -0,0 +1,77 @@
+import json
+import numpy as np
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+def get_columns(rates: dict) -> tuple:
+    """
+    Turns rates ({date: {code: rate}}) into a list of dates and a list of rates by currency code,
+    missing rates are None.
+    """
+    dates = list(rates)
+    codes = list(dict.fromkeys(code for x in rates.values() for code in x))
+
+    return dates, {code: [rates[x].get(code) for x in dates] for code in codes}
+
+
+class ColumnarRenderer(JSONRenderer):
+    """
+    Renders rates as one "dates" array and one array of rates per currency (?format=columnar),
+    so currency codes aren't repeated for every date.
+    """
+
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and isinstance(data.get("rates"), dict):
+            dates, columns = get_columns(data["rates"])
+            data = {**data, "dates": dates, "rates": columns}
+
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class PackedFloat64Renderer(BaseRenderer):
+    """
+    Renders rates as packed little-endian float64 (?format=float64), missing rates are NaN.
+    Body is a 4 bytes little-endian header length, a JSON header with the response fields,
+    "dates", "currencies" and "shape", padded so rates start at a multiple of 8 bytes,
+    and the rates matrix of the shape, a row per currency. It can be read with:
+
+        size = int.from_bytes(content[:4], "little")
+        header = json.loads(content[4 : 4 + size])
+        rates = np.frombuffer(content, "<f8", offset=4 + size).reshape(header["shape"])
+    """
+
+    media_type = "application/octet-stream"
+    format = "float64"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not (isinstance(data, dict) and isinstance(data.get("rates"), dict)):
+            # Errors have no rates to pack, they are sent as JSON, so clients can tell them from rates
+            response = (renderer_context or {}).get("response")
+            if response is not None:
+                response["Content-Type"] = JSONRenderer.media_type
+
+            return JSONRenderer().render(data)
+
+        dates, columns = get_columns(data["rates"])
+
+        # None turns into NaN
+        values = np.array(list(columns.values()), dtype="<f8").reshape(
+            len(columns), len(dates)
+        )
+
+        header = json.dumps(
+            {
+                **{k: v for k, v in data.items() if k != "rates"},
+                "dates": dates,
+                "currencies": list(columns),
+                "shape": values.shape,
+            },
+            separators=(",", ":"),
+        ).encode()
+        header += b" " * (-(4 + len(header)) % 8)
+
+        return len(header).to_bytes(4, "little") + header + values.tobytes()
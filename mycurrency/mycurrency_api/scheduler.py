@@ -0,0 +1,216 @@
+import asyncio
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connections
+
+# Accessing provider concurrency settings
+PROVIDER_MAX_WORKERS = settings.PROVIDER_MAX_WORKERS
+PROVIDER_MAX_CONCURRENCY = settings.PROVIDER_MAX_CONCURRENCY
+PROVIDER_RATE_LIMIT = settings.PROVIDER_RATE_LIMIT
+
+
+class ProviderLimiter:
+    """
+    Limits number of concurrent requests and requests per second sent to a single provider.
+    """
+
+    def __init__(self, max_concurrency: int, rate_limit: float):
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.interval = 1 / rate_limit if rate_limit else 0
+        self.next_request_at = 0
+        self.calls_count = 0
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.semaphore.acquire()
+
+        with self.lock:
+            self.calls_count += 1
+
+            # Reserve the next free slot of the rate budget
+            now = time.monotonic()
+            wait = self.next_request_at - now if self.interval else 0
+            self.next_request_at = max(now, self.next_request_at) + self.interval
+
+        if wait > 0:
+            time.sleep(wait)
+
+        return self
+
+    def __exit__(self, *args):
+        self.semaphore.release()
+
+
+class AsyncProviderLimiter:
+    """
+    Provider limiter for coroutines, waiting for a free slot doesn't block the event loop.
+    """
+
+    def __init__(self, max_concurrency: int, rate_limit: float):
+        self.semaphore = asyncio.BoundedSemaphore(max_concurrency)
+        self.interval = 1 / rate_limit if rate_limit else 0
+        self.next_request_at = 0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+
+        if self.interval:
+            # Reserve the next free slot of the rate budget
+            now = time.monotonic()
+            wait = self.next_request_at - now
+            self.next_request_at = max(now, self.next_request_at) + self.interval
+
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        return self
+
+    async def __aexit__(self, *args):
+        self.semaphore.release()
+
+
+class ProviderLimiters:
+    """
+    Keeps one limiter per provider.
+    """
+
+    def __init__(self):
+        self.limiters = {}
+        # Async limiters are bound to the event loop they were created in
+        self.async_limiters = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def get(self, provider_name: str) -> ProviderLimiter:
+        with self.lock:
+            if provider_name not in self.limiters:
+                self.limiters[provider_name] = ProviderLimiter(
+                    PROVIDER_MAX_CONCURRENCY, PROVIDER_RATE_LIMIT
+                )
+            return self.limiters[provider_name]
+
+    def get_calls_count(self) -> int:
+        """
+        Number of requests sent to providers through sync limiters so far.
+        """
+        with self.lock:
+            return sum(x.calls_count for x in self.limiters.values())
+
+    def aget(self, provider_name: str) -> AsyncProviderLimiter:
+        """
+        Limiter of the provider for the running event loop. Limits hold for a server running
+        a single long-lived loop (ASGI), under WSGI every request has its own loop and budget.
+        """
+        limiters = self.async_limiters.setdefault(asyncio.get_running_loop(), {})
+
+        if provider_name not in limiters:
+            limiters[provider_name] = AsyncProviderLimiter(
+                PROVIDER_MAX_CONCURRENCY, PROVIDER_RATE_LIMIT
+            )
+        return limiters[provider_name]
+
+
+provider_limiters = ProviderLimiters()
+
+
+# One pool is shared by every caller, so threads asking providers are bounded process-wide
+executor = ThreadPoolExecutor(
+    max_workers=PROVIDER_MAX_WORKERS, thread_name_prefix="provider-worker"
+)
+worker_state = threading.local()
+
+
+def run_concurrently(function, items: list) -> list:
+    """
+    Calls function for every item in the shared thread pool, returns results in the order of items.
+    Calls made from a worker of the pool run inline.
+    """
+    items = list(items)
+
+    if len(items) <= 1 or getattr(worker_state, "active", False):
+        # A worker waiting for its own pool could deadlock it, nested items run in the worker
+        return [function(x) for x in items]
+
+    def task(item):
+        worker_state.active = True
+        try:
+            return function(item)
+        finally:
+            worker_state.active = False
+            # Worker threads must not leak database connections
+            connections.close_all()
+
+    return list(executor.map(task, items))
+
+
+async def gather_concurrently(
+    function, items: list, max_workers=PROVIDER_MAX_WORKERS
+) -> list:
+    """
+    Awaits coroutine function for every item with bounded parallelism, returns results in the order of items.
+    """
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def task(item):
+        async with semaphore:
+            return await function(item)
+
+    return await asyncio.gather(*[task(x) for x in items])
+
+
+def merge_series(results: list) -> dict:
+    """
+    Merges rates of timeseries results in date order.
+    """
+    series = {}
+    for result in results:
+        series.update(result["rates"])
+
+    return dict(sorted(series.items()))
+
+
+class FetchScheduler:
+    """
+    Fetches missing rates from providers concurrently with bounded parallelism.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+
+    def fetch_series(
+        self, source_currency: str, date_ranges: list, *args, **kwargs
+    ) -> dict:
+        """
+        Asks providers for every missing date range at once, returns rates by date merged in date order.
+        """
+        # Providers are loaded in the calling thread, workers only make HTTP requests
+        self.adapter.update_adapters()
+
+        results = run_concurrently(
+            lambda date_range: self.adapter.get_exchange_rate_series(
+                source_currency, str(date_range[0]), str(date_range[1]), *args, **kwargs
+            ),
+            date_ranges,
+        )
+
+        return merge_series(results)
+
+
+class AsyncFetchScheduler(FetchScheduler):
+    """
+    Fetch scheduler for async adapter, missing date ranges are awaited together.
+    """
+
+    async def fetch_series(
+        self, source_currency: str, date_ranges: list, *args, **kwargs
+    ) -> dict:
+        results = await gather_concurrently(
+            lambda date_range: self.adapter.get_exchange_rate_series(
+                source_currency, str(date_range[0]), str(date_range[1]), *args, **kwargs
+            ),
+            date_ranges,
+        )
+
+        return merge_series(results)
@@ -1,12 +1,78 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from unittest.mock import Mock, patch
+from asgiref.sync import sync_to_async
+import numpy as np
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from rest_framework import status
+from .adapters import Adapter, DriverPool
+from .caching import SingleFlight, rates_cache, response_cache
+from .drivers import AsyncBaseDriver
+from .management.commands import (
+    backfill_rates,
+    import_cache,
+    import_rates,
+    prefetch_rates,
+)
+from .models import CurrencyExchangeRate, Provider
+from .operations import (
+    AsyncProviderAdapter,
+    ProviderScheduler,
+    cache_rates,
+    check_currency,
+    get_cache_stats,
+    get_exchange_data,
+    get_rates_range,
+    get_redis_id,
+    store_exchange_rates,
+    store_exchange_series,
+)
+from .registry import currency_registry
+from .scheduler import run_concurrently
 
 
-class ProvidersAPITest(TestCase):
+# Tests never reach the configured Redis
+TEST_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-default",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    },
+    "local": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "test-local",
+    },
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheTestCase(TestCase):
+    """
+    Database is rolled back after every test, so every test starts with empty caches and currency registry.
+    """
+
+    def setUp(self):
+        currency_registry.invalidate()
+        caches["default"].clear()
+        caches["local"].clear()
+
+
+class ProvidersAPITest(CacheTestCase):
     fixtures = ["default_providers.json"]
 
     def setUp(self):
+        super().setUp()
         self.url = "http://127.0.0.1:8000/api/v1/providers/"
         self.add_data = {
             "name": "test",
@@ -59,29 +125,232 @@ class ProvidersAPITest(TestCase):
         response = self.client.delete(self.url, self.delete_data, format="json")
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_provider_changes_reload_adapters(self):
+        adapter = Adapter()
+        adapter.update_adapters()
+
+        # Unchanged providers aren't read again
+        with self.assertNumQueries(0):
+            adapter.update_adapters()
 
-class RatesAPITest(TestCase):
+        self.assertEqual([x.name for x in adapter.active_providers], ["Fixer"])
+
+        self.client.put(self.url, self.prioritize_data, format="json")
+
+        with self.assertNumQueries(1):
+            adapter.update_adapters()
+
+        self.assertEqual([x.name for x in adapter.active_providers], ["Mock", "Fixer"])
+
+
+class RatesAPITest(CacheTestCase):
     fixtures = ["test_provider.json"]
 
     def setUp(self):
+        super().setUp()
         self.url = "http://127.0.0.1:8000/api/v1/rates/?source_currency=EUR&date_from=2024-01-01&date_to=2024-01-04"
         self.client = APIClient()
 
     def test_get_rates(self):
         response = self.client.get(self.url)
 
-        self.assertIn("source_currency", response.data)
-        self.assertIn("date_from", response.data)
-        self.assertIn("date_to", response.data)
-        self.assertIn("rates", response.data)
+        self.assertIn("source_currency", response.json())
+        self.assertIn("date_from", response.json())
+        self.assertIn("date_to", response.json())
+        self.assertIn("rates", response.json())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stored_window_is_read_with_one_query(self):
+        source_currency = currency_registry.get("EUR")
+        codes = [x for x in settings.AVAILABLE_CURRENCIES if x != "EUR"]
+
+        store_exchange_series(
+            source_currency,
+            {f"2023-01-0{day}": {code: 1.1 for code in codes} for day in (1, 2, 3)},
+        )
+        caches["default"].clear()
+        caches["local"].clear()
+
+        with self.assertNumQueries(1):
+            rates = get_rates_range(
+                source_currency,
+                codes,
+                datetime(2023, 1, 1).date(),
+                datetime(2023, 1, 3).date(),
+            )
+
+        self.assertEqual(len(rates), 3)
+
+    def test_get_rates_derives_missing_pairs(self):
+        store_exchange_rates(
+            currency_registry.get("EUR"),
+            "2023-01-02",
+            {"USD": 1.1, "GBP": 0.8, "CHF": 0.95},
+        )
+
+        response = self.client.get(
+            "http://127.0.0.1:8000/api/v1/rates/?source_currency=USD&date_from=2023-01-02&date_to=2023-01-02"
+        )
+
+        self.assertEqual(
+            response.json()["rates"]["2023-01-02"],
+            {
+                "EUR": round(1 / 1.1, 6),
+                "CHF": round(0.95 / 1.1, 6),
+                "GBP": round(0.8 / 1.1, 6),
+            },
+        )
+
+    def test_get_rates_prefers_provider_rates_over_reversed_ones(self):
+        store_exchange_rates(currency_registry.get("EUR"), "2023-01-02", {"USD": 2.0})
+        date = datetime(2023, 1, 2).date()
+
+        # USD to EUR is known as a reversed rate, USD to GBP is missing
+        with patch.object(
+            ProviderScheduler,
+            "fetch_series",
+            return_value={"2023-01-02": {"EUR": 0.4, "GBP": 0.7}},
+        ):
+            rates = get_rates_range(
+                currency_registry.get("USD"), ["EUR", "GBP"], date, date
+            )
+
+        self.assertEqual(rates["2023-01-02"], {"EUR": 0.4, "GBP": 0.7})
+
+    def test_get_rates_not_modified(self):
+        response = self.client.get(self.url)
+
+        self.assertIn("immutable", response["Cache-Control"])
+
+        etag = response["ETag"]
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Rates stored outside the window don't change its validators
+        store_exchange_rates(currency_registry.get("EUR"), "2023-06-01", {"USD": 1.1})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        store_exchange_rates(currency_registry.get("EUR"), "2024-01-02", {"USD": 2.5})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_rates_response_is_cached_once(self):
+        with patch.object(
+            response_cache, "set", wraps=response_cache.set
+        ) as set_response:
+            # First request stores rates gathered from the provider, which changes versions of the window
+            for _ in range(3):
+                self.client.get(self.url)
+
+        self.assertEqual(set_response.call_count, 1)
+
+    def test_get_rates_cached_response_is_invalidated_on_store(self):
+        self.client.get(self.url)
+
+        store_exchange_rates(currency_registry.get("EUR"), "2024-01-02", {"USD": 2.5})
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.json()["rates"]["2024-01-02"]["USD"], 2.5)
+
+    def test_invalid_query_sets_no_versions(self):
+        with patch.object(response_cache, "get_versions") as get_versions:
+            for url in (
+                "http://127.0.0.1:8000/api/v1/rates/?source_currency=XXX&date_from=2024-01-01&date_to=2024-01-04",
+                "http://127.0.0.1:8000/api/v1/rates/?source_currency=EUR&date_from=2024-01-04&date_to=2024-01-01",
+                "http://127.0.0.1:8000/api/v1/twrr/?source_currency=EUR&amount=20&exchanged_currency=XXX&start_date=0001-01-01",
+            ):
+                response = self.client.get(url)
+
+                self.assertEqual(
+                    response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+
+        get_versions.assert_not_called()
+
+    def test_missing_versions_are_set_at_once_and_expire(self):
+        with patch("mycurrency_api.caching.cache") as cache:
+            cache.get_many.return_value = {}
+            versions = response_cache.get_versions(
+                ["EUR", "USD"], datetime(2024, 1, 1), datetime(2024, 2, 1)
+            )
+
+        self.assertEqual(len(versions), 4)
+        cache.set_many.assert_called_once_with(
+            versions, timeout=settings.RESPONSE_CACHE_TIMEOUT
+        )
+        cache.get.assert_not_called()
+
+    async def test_stream_rates(self):
+        rates = (await self.async_client.get(self.url)).json()
+
+        response = await self.async_client.get(f"{self.url}&stream=ndjson")
+
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertNotIn("ETag", response)
+
+        lines = b"".join([x async for x in response.streaming_content]).splitlines()
+
+        self.assertEqual(
+            {x["date"]: x["rates"] for x in map(json.loads, lines)}, rates["rates"]
+        )
+
+        response = await self.async_client.get(f"{self.url}&stream=json")
+        content = b"".join([x async for x in response.streaming_content])
 
-class ConverterAPITest(TestCase):
+        self.assertEqual(json.loads(content), rates)
+
+    def test_get_rates_pages(self):
+        rates = self.client.get(self.url).json()["rates"]
+
+        pages = {}
+        url = f"{self.url}&page_size=3"
+
+        while url:
+            response = self.client.get(url).json()
+            pages.update(response["rates"])
+            url = response["next"]
+
+        self.assertEqual(pages, rates)
+
+    def test_get_rates_columnar(self):
+        rates = self.client.get(self.url).json()["rates"]
+
+        response = self.client.get(f"{self.url}&format=columnar").json()
+
+        self.assertEqual(response["dates"], list(rates))
+        for code, column in response["rates"].items():
+            self.assertEqual(column, [rates[x].get(code) for x in rates])
+
+        content = self.client.get(f"{self.url}&format=float64").content
+        size = int.from_bytes(content[:4], "little")
+        header = json.loads(content[4 : 4 + size])
+        values = np.frombuffer(content, "<f8", offset=4 + size)
+
+        self.assertEqual(header["dates"], response["dates"])
+        np.testing.assert_array_equal(
+            values.reshape(header["shape"]),
+            np.array([response["rates"][x] for x in header["currencies"]], dtype="<f8"),
+        )
+
+        # Errors have no rates to pack
+        response = self.client.get(
+            "http://127.0.0.1:8000/api/v1/rates/?source_currency=EUR&format=float64"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+
+class ConverterAPITest(CacheTestCase):
     fixtures = ["test_provider.json"]
 
     def setUp(self):
+        super().setUp()
         self.url = "http://127.0.0.1:8000/api/v1/convert/?source_currency=EUR&amount=10.0&exchanged_currency=USD"
         self.client = APIClient()
 
@@ -96,21 +365,604 @@ class ConverterAPITest(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    async def test_concurrent_misses_ask_the_provider_once(self):
+        convert_currencies = AsyncProviderAdapter.convert_currencies
+        calls = []
+
+        async def slow_convert_currencies(*args, **kwargs):
+            calls.append(args)
+            # Second request misses while the first one waits for the provider
+            await asyncio.sleep(0.2)
+            return await convert_currencies(*args, **kwargs)
+
+        with patch.object(
+            AsyncProviderAdapter, "convert_currencies", slow_convert_currencies
+        ):
+            responses = await asyncio.gather(
+                self.async_client.get(self.url), self.async_client.get(self.url)
+            )
+
+        self.assertEqual(calls, [("EUR", "USD", 10.0)])
+        self.assertEqual([x.status_code for x in responses], [status.HTTP_200_OK] * 2)
+        self.assertEqual(responses[0].json()["rate"], responses[1].json()["rate"])
+
+    def test_convert_local_hit_stays_in_worker(self):
+        self.client.get(self.url)
+        rates_cache.version_checked_at = time.monotonic()
+
+        with patch("mycurrency_api.caching.cache") as redis:
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(redis.method_calls)
+
+        # Storing the same rate again keeps local caches of every worker
+        version = caches["default"].get("rates-cache-version")
+        store_exchange_rates(
+            currency_registry.get("EUR"),
+            str(datetime.now().date()),
+            {"USD": float(response.json()["rate"])},
+        )
+
+        self.assertEqual(caches["default"].get("rates-cache-version"), version)
+
+    def test_convert_batch(self):
+        response = self.client.post(
+            "http://127.0.0.1:8000/api/v2/convert/",
+            [
+                {"source_currency": "EUR", "exchanged_currency": "USD", "amount": 10},
+                {"source_currency": "EUR", "exchanged_currency": "GBP", "amount": 5},
+                {"source_currency": "EUR", "exchanged_currency": "XXX", "amount": 5},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
 
-class TWRRAPITest(TestCase):
+        results = response.data["results"]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["exchanged_currency"], "USD")
+        self.assertIn("result", results[1])
+        self.assertIn("error", results[2])
+
+
+class TWRRAPITest(CacheTestCase):
     fixtures = ["test_provider.json"]
 
     def setUp(self):
+        super().setUp()
         self.url = "http://127.0.0.1:8000/api/v1/twrr/?source_currency=EUR&amount=20&exchanged_currency=USD&start_date=2024-04-17"
         self.client = APIClient()
 
     def test_get_twrr_values(self):
         response = self.client.get(self.url)
 
-        self.assertIn("source_currency", response.data)
-        self.assertIn("exchanged_currency", response.data)
-        self.assertIn("initial_amount", response.data)
-        self.assertIn("start_date", response.data)
-        self.assertIn("result", response.data)
+        self.assertIn("source_currency", response.json())
+        self.assertIn("exchanged_currency", response.json())
+        self.assertIn("initial_amount", response.json())
+        self.assertIn("start_date", response.json())
+        self.assertIn("result", response.json())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_twrr_values_are_chained(self):
+        response = self.client.get(self.url)
+
+        rates = dict(
+            CurrencyExchangeRate.objects.filter(
+                source_currency__code="EUR",
+                exchanged_currency__code="USD",
+                valuation_date__gte="2024-04-17",
+            ).values_list("valuation_date", "rate_value")
+        )
+        initial_rate = float(rates.pop(min(rates)))
+
+        for date, rate_value in rates.items():
+            self.assertAlmostEqual(
+                response.json()["result"][str(date)],
+                float(rate_value) / initial_rate - 1,
+                places=5,
+            )
+
+    def test_twrr_not_modified_until_the_next_day(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        class Tomorrow(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.now(tz) + timedelta(days=1)
+
+        # Window of the next day ends a day later
+        with patch("mycurrency_api.views.datetime", Tomorrow):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class DriversTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def get_fixer(self, **fields) -> Provider:
+        return Provider(
+            name="Fixer",
+            api_url="http://fixer.example/",
+            endpoints={
+                "converter": ["convert", "access_key", "currency_from", "to", "amount"]
+            },
+            **fields,
+        )
+
+    def test_driver_pool_reuses_drivers(self):
+        pool = DriverPool()
+        provider = self.get_fixer()
+        driver = pool.get(provider)
+
+        self.assertIs(pool.get(provider), driver)
+
+        # Changed configuration replaces the driver and closes the old one
+        provider.api_url = "http://fixer.example/v2/"
+
+        with patch.object(driver, "close", wraps=driver.close) as close:
+            new_driver = pool.get(provider)
+
+        self.assertIsNot(new_driver, driver)
+        self.assertEqual(new_driver.API_URL, "http://fixer.example/v2/")
+        close.assert_called_once()
+        self.assertEqual(list(pool.drivers.values()), [new_driver])
+
+    def test_timeout_fails_over_to_next_provider(self):
+        Provider.objects.filter(name="Mock").update(priority=2)
+        self.get_fixer(priority=1).save()
+
+        with patch.object(
+            requests.Session, "get", side_effect=requests.Timeout()
+        ) as get:
+            converted_data = Adapter().convert_currencies("EUR", "USD", 10.0)
+
+        # Slow provider is given up after the timeout, the next one answers
+        get.assert_called_once()
+        self.assertEqual(
+            get.call_args.kwargs["timeout"],
+            (settings.PROVIDER_CONNECT_TIMEOUT, settings.PROVIDER_READ_TIMEOUT),
+        )
+        self.assertEqual(
+            converted_data["query"], {"from": "EUR", "to": "USD", "amount": 10.0}
+        )
+
+    async def test_async_driver_closes_clients(self):
+        driver = AsyncBaseDriver(api_url="http://127.0.0.1/mock_api/")
+        client = driver.client
+
+        # Drivers are replaced from worker threads, the client is closed in its own loop
+        await sync_to_async(driver.close)()
+        await asyncio.sleep(0)
+        await asyncio.gather(*driver.closing_tasks)
+
+        self.assertTrue(client.is_closed)
+        self.assertFalse(driver.clients)
+
+
+class RatesCacheTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def test_restored_rate_replaces_cached_reversed_rate(self):
+        eur = currency_registry.get("EUR")
+        usd = currency_registry.get("USD")
+
+        for rate_value, reversed_value in ((2.0, 0.5), (4.0, 0.25)):
+            store_exchange_rates(eur, "2023-01-02", {"USD": rate_value})
+
+            rates = get_rates_range(
+                usd, ["EUR"], datetime(2023, 1, 2).date(), datetime(2023, 1, 2).date()
+            )
+
+            self.assertEqual(rates["2023-01-02"]["EUR"], reversed_value)
+            self.assertEqual(get_exchange_data(usd, eur, "2023-01-02"), reversed_value)
+
+    def test_cached_window_is_read_with_one_round_trip(self):
+        source_currency = currency_registry.get("EUR")
+        codes = [x for x in settings.AVAILABLE_CURRENCIES if x != "EUR"]
+        dates = [f"2023-01-0{day}" for day in (1, 2, 3)]
+
+        store_exchange_series(
+            source_currency, {date: {code: 1.1 for code in codes} for date in dates}
+        )
+        # Only Redis holds the rates
+        caches["local"].clear()
+
+        with patch(
+            "mycurrency_api.caching.cache", Mock(wraps=caches["default"])
+        ) as redis:
+            rates = get_rates_range(
+                source_currency,
+                codes,
+                datetime(2023, 1, 1).date(),
+                datetime(2023, 1, 3).date(),
+            )
+
+        self.assertEqual(rates, {date: {code: 1.1 for code in codes} for date in dates})
+        self.assertEqual(redis.get_many.call_count, 1)
+        # Only the local cache version may be checked with a single get
+        self.assertEqual(
+            [x.args[0] for x in redis.get.call_args_list],
+            ["rates-cache-version"] * redis.get.call_count,
+        )
+
+    def test_rates_of_past_dates_use_historical_timeout(self):
+        today = str(datetime.now().date())
+
+        with patch("mycurrency_api.operations.RATES_CACHE_TIMEOUT", 60), patch(
+            "mycurrency_api.operations.RATES_CACHE_HISTORICAL_TIMEOUT", 3600
+        ), patch.object(rates_cache, "set_many") as set_many:
+            cache_rates(
+                currency_registry.get("EUR"),
+                {"2023-01-02": {"USD": 1.1}, today: {"USD": 1.2}},
+            )
+
+        self.assertEqual(
+            {x.kwargs["timeout"]: x.args[0] for x in set_many.call_args_list},
+            {
+                3600: {get_redis_id("EUR", "USD", "2023-01-02"): 1.1},
+                60: {get_redis_id("EUR", "USD", today): 1.2},
+            },
+        )
+
+    def test_cache_stats_count_hits_and_misses(self):
+        eur = currency_registry.get("EUR")
+        usd = currency_registry.get("USD")
+
+        store_exchange_rates(eur, "2023-01-02", {"USD": 1.1})
+        rates_cache.invalidate()
+        caches["default"].delete(get_redis_id("EUR", "USD", "2023-01-02"))
+
+        stats = get_cache_stats()
+
+        # Miss, then the written back rate is a hit
+        for _ in range(3):
+            get_exchange_data(eur, usd, "2023-01-02")
+
+        counts = get_cache_stats()
+        self.assertEqual(counts["hits"] - stats["hits"], 2)
+        self.assertEqual(counts["misses"] - stats["misses"], 1)
+
+
+class CurrencyRegistryTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def test_repeated_lookups_dont_query(self):
+        currency_registry.get("EUR")
+
+        with self.assertNumQueries(0):
+            for code in settings.AVAILABLE_CURRENCIES * 3:
+                self.assertEqual(currency_registry.get(code).code, code)
+
+    def test_currency_changes_reload_registry(self):
+        currency = currency_registry.get("EUR")
+        currency.name = "Euro (changed)"
+        currency.save()
+
+        # Registry is loaded again with a single query
+        with self.assertNumQueries(1):
+            self.assertEqual(currency_registry.get("EUR").name, "Euro (changed)")
+
+        currency = currency_registry.get("GBP")
+        pk = currency.pk
+        currency.delete()
+
+        # Deleted available currency is created again
+        self.assertNotEqual(currency_registry.get("GBP").pk, pk)
+
+
+class SingleFlightTest(CacheTestCase):
+    def test_concurrent_misses_load_once(self):
+        values = {}
+        loads = []
+        results = []
+
+        def load():
+            loads.append(1)
+            # Second caller misses while the first one loads
+            time.sleep(0.2)
+            values["rate"] = 1.1
+            return values["rate"]
+
+        def run(single_flight):
+            results.append(
+                single_flight.run("rate-EUR-USD", lambda: values.get("rate"), load)
+            )
+
+        # Every thread plays a worker with its own local locks, so callers meet at the cache lock
+        threads = [
+            threading.Thread(target=run, args=(SingleFlight(timeout=5),))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(loads, [1])
+        self.assertEqual(results, [1.1, 1.1])
+
+
+class PrefetchRatesCommandTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def test_schedule_retries_and_waits_for_the_next_day(self):
+        class StopSchedule(Exception):
+            pass
+
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 3:
+                raise StopSchedule()
+
+        prefetch = prefetch_rates.prefetch_rates
+        dates = []
+
+        def flaky_prefetch(date):
+            dates.append(date)
+            if len(dates) == 1:
+                raise Exception("Providers were unable to gather rate data.")
+            return prefetch(date)
+
+        scheduler_time = Mock(wraps=time)
+        scheduler_time.sleep.side_effect = sleep
+
+        with patch.object(prefetch_rates, "time", scheduler_time), patch.object(
+            prefetch_rates, "prefetch_rates", flaky_prefetch
+        ):
+            with self.assertRaises(StopSchedule):
+                call_command(
+                    "prefetch_rates",
+                    "--schedule",
+                    "--at",
+                    "06:00",
+                    stdout=io.StringIO(),
+                    stderr=io.StringIO(),
+                )
+
+        today = datetime.now().date()
+        next_run_at = datetime.combine(
+            today + timedelta(days=1), datetime.strptime("06:00", "%H:%M").time()
+        )
+
+        # Rates of the day are prefetched right away, a failure is retried, then the next day is awaited
+        self.assertEqual(dates, [today, today])
+        self.assertAlmostEqual(sleeps[0], 0, delta=1)
+        self.assertAlmostEqual(
+            sleeps[1], settings.PREFETCH_RATES_RETRY_INTERVAL, delta=1
+        )
+        self.assertAlmostEqual(
+            sleeps[2], (next_run_at - datetime.now()).total_seconds(), delta=1
+        )
+        self.assertIsNotNone(
+            caches["default"].get(get_redis_id("EUR", "USD", str(today)))
+        )
+
+
+class ImportCacheCommandTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def test_warm_days_caches_recent_stored_rates(self):
+        today = datetime.now().date()
+        recent_date = str(today - timedelta(days=1))
+        old_date = str(today - timedelta(days=10))
+
+        store_exchange_rates(
+            currency_registry.get("EUR"), recent_date, {"USD": 1.1, "GBP": 0.8}
+        )
+        store_exchange_rates(currency_registry.get("EUR"), old_date, {"USD": 1.2})
+
+        # Rates are warmed from the database, not from whatever was cached on store
+        caches["default"].clear()
+        stdout = io.StringIO()
+
+        with patch.object(import_cache, "CACHE_WARM_BATCH_SIZE", 1):
+            call_command("import_cache", warm_days=3, stdout=stdout)
+
+        self.assertEqual(
+            caches["default"].get(get_redis_id("EUR", "USD", recent_date)), 1.1
+        )
+        self.assertEqual(
+            caches["default"].get(get_redis_id("EUR", "GBP", recent_date)), 0.8
+        )
+        self.assertIsNone(caches["default"].get(get_redis_id("EUR", "USD", old_date)))
+
+        # Every batch reports its progress
+        self.assertIn("Cached 1 rates", stdout.getvalue())
+        self.assertIn("Cached 2 rates", stdout.getvalue())
+        self.assertIn("Cache warm-up finished: 2 rates", stdout.getvalue())
+
+
+class ImportRatesCommandTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def write_file(self, suffix: str, content: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_rates(self, path: str, **options):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("import_rates", path, stdout=io.StringIO(), **options)
+
+    def get_rates(self) -> dict:
+        return {
+            (
+                x.source_currency.code,
+                x.exchanged_currency.code,
+                str(x.valuation_date),
+            ): float(x.rate_value)
+            for x in CurrencyExchangeRate.objects.all()
+        }
+
+    def test_import_csv_and_json_lines(self):
+        path = self.write_file(
+            ".csv",
+            "source_currency,exchanged_currency,valuation_date,rate_value\n"
+            "EUR,USD,2024-01-01,1.1234567\n"
+            "EUR,EUR,2024-01-01,1\n"
+            "EUR,XXX,2024-01-01,2\n"
+            "USD,GBP,2024-01-01,0.8\n"
+            "EUR,USD,2024-01-02,1.2\n",
+        )
+        self.import_rates(path, chunk_size=1)
+
+        self.assertEqual(
+            self.get_rates(),
+            {
+                ("EUR", "USD", "2024-01-01"): 1.123457,
+                ("USD", "GBP", "2024-01-01"): 0.8,
+                ("EUR", "USD", "2024-01-02"): 1.2,
+            },
+        )
+        self.assertEqual(
+            caches["default"].get(get_redis_id("EUR", "USD", "2024-01-01")), 1.123457
+        )
+
+        # Already stored rates are updated
+        path = self.write_file(
+            ".jsonl",
+            json.dumps(
+                {
+                    "source_currency": "EUR",
+                    "exchanged_currency": "USD",
+                    "valuation_date": "2024-01-01",
+                    "rate_value": 1.3,
+                }
+            )
+            + "\n\n",
+        )
+        self.import_rates(path)
+
+        self.assertEqual(self.get_rates()[("EUR", "USD", "2024-01-01")], 1.3)
+        self.assertEqual(CurrencyExchangeRate.objects.count(), 3)
+        self.assertEqual(
+            caches["default"].get(get_redis_id("EUR", "USD", "2024-01-01")), 1.3
+        )
+
+    def test_failed_chunk_leaves_no_cached_rates(self):
+        path = self.write_file(
+            ".csv",
+            "source_currency,exchanged_currency,valuation_date,rate_value\n"
+            "EUR,USD,2024-01-01,1.1\n"
+            "USD,GBP,2024-01-01,0.8\n",
+        )
+
+        upsert_exchange_series = import_rates.upsert_exchange_series
+
+        def fail_on_usd(source_currency, series):
+            if source_currency.code == "USD":
+                raise ValueError("Broken chunk")
+            return upsert_exchange_series(source_currency, series)
+
+        with patch.object(import_rates, "upsert_exchange_series", fail_on_usd):
+            with self.assertRaises(ValueError):
+                self.import_rates(path)
+
+        self.assertFalse(CurrencyExchangeRate.objects.exists())
+        self.assertIsNone(
+            caches["default"].get(get_redis_id("EUR", "USD", "2024-01-01"))
+        )
+
+
+class BackfillRatesCommandTest(CacheTestCase):
+    fixtures = ["test_provider.json"]
+
+    def setUp(self):
+        super().setUp()
+
+        checkpoint_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_directory.cleanup)
+        self.checkpoint_path = os.path.join(
+            checkpoint_directory.name, "checkpoint.json"
+        )
+
+    def backfill_rates(self, *args, **options) -> str:
+        stdout = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "backfill_rates",
+                *args,
+                checkpoint=self.checkpoint_path,
+                stdout=stdout,
+                **options,
+            )
+        return stdout.getvalue()
+
+    def test_resume_skips_backfilled_and_stored_rates(self):
+        # USD was backfilled by an interrupted run, EUR rates of the first window are stored
+        with open(self.checkpoint_path, "w") as f:
+            json.dump(
+                {
+                    "date_from": "2024-01-01",
+                    "date_to": "2024-01-06",
+                    "done": {"USD": "2024-01-06"},
+                },
+                f,
+            )
+
+        store_exchange_series(
+            check_currency("EUR"),
+            {
+                f"2024-01-0{day}": {
+                    code: 1.1 for code in settings.AVAILABLE_CURRENCIES if code != "EUR"
+                }
+                for day in (1, 2, 3)
+            },
+        )
+
+        fetch_series = backfill_rates.ProviderScheduler.fetch_series
+
+        # Provider without range calls is asked once per day
+        with patch.object(
+            backfill_rates.ProviderScheduler, "fetch_series", wraps=fetch_series
+        ) as fetch_series, patch.object(
+            Adapter, "get_timeseries_data", return_value=False
+        ):
+            output = self.backfill_rates(
+                "2024-01-01", "2024-01-06", currencies=["EUR", "USD"], batch_days=3
+            )
+
+        fetch_series.assert_called_once_with(
+            "EUR", [(datetime(2024, 1, 4).date(), datetime(2024, 1, 6).date())]
+        )
+        self.assertIn("Resuming backfill", output)
+        self.assertIn(" 3 calls ", output)
+        self.assertEqual(
+            sorted(
+                str(x)
+                for x in CurrencyExchangeRate.objects.filter(
+                    source_currency__code="EUR", exchanged_currency__code="USD"
+                ).values_list("valuation_date", flat=True)
+            ),
+            [f"2024-01-0{day}" for day in range(1, 7)],
+        )
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+
+class RunConcurrentlyTest(CacheTestCase):
+    def test_nested_calls_run_in_the_worker(self):
+        def fetch_range(days):
+            return threading.current_thread().name, run_concurrently(
+                lambda day: threading.current_thread().name, days
+            )
+
+        results = run_concurrently(fetch_range, [range(x, x + 10) for x in range(10)])
+
+        # Per-day calls of a range never leave the worker of the range
+        for worker, day_threads in results:
+            self.assertTrue(worker.startswith("provider-worker"))
+            self.assertEqual(set(day_threads), {worker})
+
+        self.assertLessEqual(
+            len({x for x, _ in results}), settings.PROVIDER_MAX_WORKERS
+        )
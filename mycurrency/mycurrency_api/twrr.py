@@ -0,0 +1,46 @@
+import numpy as np
+from datetime import timedelta
+
+
+def get_rate_series(
+    rates: dict, exchanged_code: str, start_date, end_date
+) -> np.ndarray:
+    """
+    Getting rates of the exchanged currency from start_date to end_date as an array, one value per day.
+    """
+    days = (end_date - start_date).days + 1
+
+    series = np.fromiter(
+        (
+            rates.get(str(start_date + timedelta(days=i)), {}).get(
+                exchanged_code, np.nan
+            )
+            for i in range(days)
+        ),
+        dtype=np.float64,
+        count=days,
+    )
+
+    if np.isnan(series).any():
+        raise Exception(f"{exchanged_code} rates are not available for every date.")
+
+    return series
+
+
+def get_growth_series(rate_series: np.ndarray) -> np.ndarray:
+    """
+    Cumulative log growth of the pair for every day of the rate series. Without cash flows,
+    sum of daily log returns telescopes to the log of the rate.
+    """
+    return np.log(rate_series)
+
+
+def get_twrr_series(growth_series: np.ndarray) -> np.ndarray:
+    """
+    Calculates TWRR for every day of the growth series from prefix differences of log growth,
+    it equals chained sub-period returns: TWRR = (1 + r1) * (1 + r2) * ... * (1 + rn) - 1.
+    """
+    if not growth_series.size:
+        return growth_series
+
+    return np.expm1(growth_series - growth_series[0])
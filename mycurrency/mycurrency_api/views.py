@@ -1,9 +1,112 @@
 from rest_framework.views import APIView
+from adrf.views import APIView as AsyncAPIView
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from .serializers import ProviderSerializer
+from .renderers import ColumnarRenderer, PackedFloat64Renderer
 from .models import Provider
 from rest_framework import status
-from .operations import get_currency_rates, get_converted_data, get_twrr_values
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from .caching import response_cache
+from .conditional import (
+    add_caching_headers,
+    get_not_modified_response,
+    get_response_key,
+    get_validators,
+    get_versions,
+)
+from .operations import (
+    aget_currency_rates,
+    aget_currency_rates_page,
+    aget_currency_rates_stream,
+    aget_converted_batch,
+    aget_converted_data,
+    aget_twrr_values,
+    get_cache_timeout,
+    parse_rates_query,
+    parse_twrr_query,
+)
+from datetime import datetime
+
+# Accessing an available currencies from settings
+AVAILABLE_CURRENCIES = settings.AVAILABLE_CURRENCIES
+
+
+def get_query_params(request) -> dict:
+    """
+    Query parameters of the operation, without the format of the response.
+    """
+    return {
+        k: v
+        for k, v in request.query_params.lists()
+        if k != api_settings.URL_FORMAT_OVERRIDE
+    }
+
+
+def get_rendered_response(renderer, content: bytes) -> HttpResponse:
+    content_type = renderer.media_type
+
+    if renderer.charset:
+        content_type = f"{content_type}; charset={renderer.charset}"
+
+    return HttpResponse(content, content_type=content_type)
+
+
+async def get_cached_response(request, version, codes, start_date, end_date, load):
+    """
+    Serves rendered responses from the response cache, a missing response is loaded and rendered once.
+    Responses carry validators of rates of the window, a client which has the current version gets 304.
+    The browsable API is rendered as usual.
+    """
+    versions = await sync_to_async(get_versions)(codes, start_date, end_date)
+    etag, last_modified = get_validators(request, version, versions, end_date)
+
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified:
+        return add_caching_headers(not_modified, etag, last_modified, end_date)
+
+    renderer = request.accepted_renderer
+    key = get_response_key(request, version, versions, end_date)
+
+    if renderer.format != "api":
+        content = await sync_to_async(response_cache.get)(key)
+
+        if content is not None:
+            return add_caching_headers(
+                get_rendered_response(renderer, content),
+                etag,
+                last_modified,
+                end_date,
+            )
+
+    data = await load()
+    loaded_versions = await sync_to_async(get_versions)(codes, start_date, end_date)
+
+    if loaded_versions != versions:
+        # Rates of the window were stored while loading, e.g. gathered from providers,
+        # the response isn't cached since it might not match a single version of the window
+        etag, last_modified = get_validators(
+            request, version, loaded_versions, end_date
+        )
+        key = None
+
+    if renderer.format == "api":
+        response = Response(data, status=status.HTTP_200_OK)
+    else:
+        content = renderer.render(
+            data, request.accepted_media_type, {"request": request}
+        )
+        if key:
+            await sync_to_async(response_cache.set)(
+                key, content, timeout=get_cache_timeout(end_date)
+            )
+        response = get_rendered_response(renderer, content)
+
+    return add_caching_headers(response, etag, last_modified, end_date)
 
 
 class Providers(APIView):
@@ -119,8 +222,13 @@ class Providers(APIView):
             )
 
 
-class Rates(APIView):
-    def get(self, request, version, format=None):
+class Rates(AsyncAPIView):
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
+        ColumnarRenderer,
+        PackedFloat64Renderer,
+    ]
+
+    async def get(self, request, version, format=None):
         """
         returns a time series list of rate values for each available Currency.
         """
@@ -133,14 +241,63 @@ class Rates(APIView):
                         {"error": f"Missing '{param_name}' parameter in query"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
+
+            async def get_currency_rates_page():
+                currency_rates = await aget_currency_rates_page(
+                    **get_query_params(request)
+                )
+                next_cursor = currency_rates.pop("next_cursor")
+
+                currency_rates["next"] = (
+                    replace_query_param(
+                        request.build_absolute_uri(), "cursor", next_cursor
+                    )
+                    if next_cursor
+                    else None
+                )
+                return currency_rates
+
             try:
-                currency_rates = get_currency_rates(**request.query_params)
+                # Query is checked before versions of its window are read
+                _, _, start_date, end_date = await sync_to_async(parse_rates_query)(
+                    *[request.query_params.getlist(x) for x in params_names]
+                )
+
+                if "stream" in request.query_params:
+                    # Long windows are streamed chunk by chunk instead of being built in memory
+                    chunks = await aget_currency_rates_stream(
+                        **get_query_params(request)
+                    )
+
+                    content_type = (
+                        "application/x-ndjson"
+                        if request.query_params["stream"] == "ndjson"
+                        else "application/json"
+                    )
+
+                    response = StreamingHttpResponse(chunks, content_type=content_type)
+                    # Status is sent before rates are gathered, a stream may end with an error,
+                    # so it is never cached and has no validators
+                    patch_cache_control(response, no_store=True)
+                    return response
+
+                # Response depends on rates of every available currency
+                return await get_cached_response(
+                    request,
+                    version,
+                    AVAILABLE_CURRENCIES,
+                    start_date,
+                    end_date,
+                    (
+                        get_currency_rates_page
+                        if "page_size" in request.query_params
+                        else lambda: aget_currency_rates(**get_query_params(request))
+                    ),
+                )
             except Exception as e:
                 return Response(
                     {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-
-            return Response(currency_rates, status=status.HTTP_200_OK)
         else:
             return Response(
                 {"error": "This version is not implemented yet."},
@@ -148,8 +305,8 @@ class Rates(APIView):
             )
 
 
-class Converter(APIView):
-    def get(self, request, version, format=None):
+class Converter(AsyncAPIView):
+    async def get(self, request, version, format=None):
         """
         returns an object containing the rate value between source and exchanges currencies.
         """
@@ -164,7 +321,7 @@ class Converter(APIView):
                     )
 
             try:
-                converted = get_converted_data(**request.query_params)
+                converted = await aget_converted_data(**get_query_params(request))
             except Exception as e:
                 return Response(
                     {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -177,9 +334,34 @@ class Converter(APIView):
                 status=status.HTTP_501_NOT_IMPLEMENTED,
             )
 
+    async def post(self, request, version, format=None):
+        """
+        returns result or error of every (source_currency, exchanged_currency, amount) item of the batch.
+        """
+        if version == "v2":
+            if not isinstance(request.data, list):
+                return Response(
+                    {"error": "Request body must be a list of conversions"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
 
-class TWRR(APIView):
-    def get(self, request, version, format=None):
+            try:
+                converted = await aget_converted_batch(request.data)
+            except Exception as e:
+                return Response(
+                    {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+
+            return Response(converted, status=status.HTTP_200_OK)
+        else:
+            return Response(
+                {"error": "This version is not implemented yet."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+
+
+class TWRR(AsyncAPIView):
+    async def get(self, request, version, format=None):
         """
         returns  a historical time series list of TWRR values for each
         available historical exchange rates for both (source/exchanged) Currencies.
@@ -200,13 +382,29 @@ class TWRR(APIView):
                     )
 
             try:
-                twrr_values = get_twrr_values(**request.query_params)
+                # Query is checked before versions of its window are read
+                (
+                    source_currency,
+                    exchanged_currency,
+                    _,
+                    start_date,
+                ) = await sync_to_async(parse_twrr_query)(
+                    *[request.query_params.getlist(x) for x in data_names]
+                )
+
+                # TWRR is calculated until today
+                return await get_cached_response(
+                    request,
+                    version,
+                    [source_currency.code, exchanged_currency.code],
+                    start_date,
+                    datetime.now().date(),
+                    lambda: aget_twrr_values(**get_query_params(request)),
+                )
             except Exception as e:
                 return Response(
                     {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
-
-            return Response(twrr_values, status=status.HTTP_200_OK)
         else:
             return Response(
                 {"error": "This version is not implemented yet."},